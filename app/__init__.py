@@ -4,6 +4,7 @@ from pathlib import Path
 from flask import Flask
 
 from .routes import bp
+from .status import DEFAULT_DOCKER_HUB_API_URL, DEFAULT_GITHUB_API_URL
 from .version import (
     DEFAULT_APP_VERSION,
     DEFAULT_DOCKER_IMAGE,
@@ -11,6 +12,10 @@ from .version import (
 )
 
 
+def _env_flag(name: str, default: str = "0") -> bool:
+    return os.environ.get(name, default).strip().lower() in {"1", "true", "yes", "on"}
+
+
 def create_app() -> Flask:
     app = Flask(__name__)
 
@@ -26,10 +31,47 @@ def create_app() -> Flask:
         APP_VERSION=os.environ.get("APP_VERSION", DEFAULT_APP_VERSION),
         GITHUB_REPO=os.environ.get("GITHUB_REPO", DEFAULT_GITHUB_REPO),
         DOCKER_IMAGE=os.environ.get("DOCKER_IMAGE", DEFAULT_DOCKER_IMAGE),
+        STATUS_CACHE_FILE=str(data_dir / "release_status.json"),
         STATUS_CACHE_TTL=float(os.environ.get("STATUS_CACHE_TTL", "300")),
+        STATUS_HTTP_TIMEOUT=float(os.environ.get("STATUS_HTTP_TIMEOUT", "5")),
+        STATUS_RETRY_BACKOFF=float(os.environ.get("STATUS_RETRY_BACKOFF", "30")),
+        GITHUB_API_URL=os.environ.get("GITHUB_API_URL", DEFAULT_GITHUB_API_URL),
+        DOCKER_HUB_API_URL=os.environ.get("DOCKER_HUB_API_URL", DEFAULT_DOCKER_HUB_API_URL),
+        CONTACTS_PAGE_SIZE=int(os.environ.get("CONTACTS_PAGE_SIZE", "50")),
+        API_PAGE_LIMIT=int(os.environ.get("API_PAGE_LIMIT", "500")),
+        API_BATCH_LIMIT=int(os.environ.get("API_BATCH_LIMIT", "1000")),
+        CHANGES_RETENTION=int(os.environ.get("CHANGES_RETENTION", "100000")),
+        PHONEBOOK_PAGE_SIZE=int(os.environ.get("PHONEBOOK_PAGE_SIZE", "0")),
+        FEED_CACHE_SIZE=int(os.environ.get("FEED_CACHE_SIZE", "64")),
+        FEED_CACHE_BYTES=int(os.environ.get("FEED_CACHE_BYTES", str(64 * 1024 * 1024))),
+        REPLICA_OF=os.environ.get("REPLICA_OF", "").strip(),
+        REPLICA_INTERVAL=float(os.environ.get("REPLICA_INTERVAL", "30")),
+        REPLICA_TIMEOUT=float(os.environ.get("REPLICA_TIMEOUT", "10")),
+        REPLICA_STATE_FILE=str(data_dir / "replica_state.json"),
+        TENANTS_DIR=os.environ.get("TENANTS_DIR", str(data_dir / "tenants")),
+        TENANT_CACHE_SIZE=int(os.environ.get("TENANT_CACHE_SIZE", "32")),
+        LOOKUP_COUNTRY_CODE=os.environ.get("LOOKUP_COUNTRY_CODE", ""),
+        LOOKUP_SUFFIX_DIGITS=int(os.environ.get("LOOKUP_SUFFIX_DIGITS", "9")),
+        LOOKUP_CACHE_SIZE=int(os.environ.get("LOOKUP_CACHE_SIZE", "4096")),
+        TEMPLATE_CACHE_DIR=os.environ.get("TEMPLATE_CACHE_DIR", str(data_dir / "template-cache")),
+        METRICS_DIR=os.environ.get("METRICS_DIR", ""),
+        METRICS_FLUSH_INTERVAL=float(os.environ.get("METRICS_FLUSH_INTERVAL", "5")),
+        IMPORT_BATCH_SIZE=int(os.environ.get("IMPORT_BATCH_SIZE", "1000")),
+        PUBLISH_DEBOUNCE=float(os.environ.get("PUBLISH_DEBOUNCE", "0.5")),
+        PUBLISH_FSYNC=_env_flag("PUBLISH_FSYNC"),
+        SQLITE_JOURNAL_MODE=os.environ.get("SQLITE_JOURNAL_MODE", "wal"),
+        SQLITE_BUSY_TIMEOUT=int(os.environ.get("SQLITE_BUSY_TIMEOUT", "5000")),
+        SQLITE_SYNCHRONOUS=os.environ.get("SQLITE_SYNCHRONOUS", "normal"),
+        SQLITE_CACHE_SIZE=int(os.environ.get("SQLITE_CACHE_SIZE", "-16000")),
+        SQLITE_MMAP_SIZE=int(os.environ.get("SQLITE_MMAP_SIZE", "67108864")),
+        SQLITE_TEMP_STORE=os.environ.get("SQLITE_TEMP_STORE", "memory"),
+        SQLITE_POOL_SIZE=int(os.environ.get("SQLITE_POOL_SIZE", "4")),
+        SQLITE_STATEMENT_CACHE=int(os.environ.get("SQLITE_STATEMENT_CACHE", "128")),
     )
 
     app.register_blueprint(bp)
+    # Additional phonebooks in TENANTS_DIR, e.g. /t/acme/phonebook.xml
+    app.register_blueprint(bp, url_prefix="/t/<tenant>", name="tenant")
 
     return app
 
@@ -1,28 +1,131 @@
 import sqlite3
+import sys
+import threading
+import time
 from pathlib import Path
-from typing import Iterable, List, Mapping, Optional, Set
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
 
-from flask import current_app, g
+from flask import g
+
+from .metrics import TimedConnection
+from .numbers import NUMBER_FIELDS, number_digits, number_variants
+from .pool import ConnectionPool
+from .tenants import current_tenant, tenant_config
+
+PHONEBOOK_INDEX = "idx_contacts_phonebook"
+
+# Config key -> (pragma, allowed values or None for integers). Pragmas cannot
+# take bound parameters, so values are validated before being inlined.
+SQLITE_PRAGMAS: Dict[str, Tuple[str, Optional[Set[str]]]] = {
+    "SQLITE_JOURNAL_MODE": (
+        "journal_mode",
+        {"delete", "truncate", "persist", "memory", "wal", "off"},
+    ),
+    "SQLITE_BUSY_TIMEOUT": ("busy_timeout", None),
+    "SQLITE_SYNCHRONOUS": ("synchronous", {"off", "normal", "full", "extra"}),
+    "SQLITE_CACHE_SIZE": ("cache_size", None),
+    "SQLITE_MMAP_SIZE": ("mmap_size", None),
+    "SQLITE_TEMP_STORE": ("temp_store", {"default", "file", "memory"}),
+}
+# SQLite reports these pragmas as numbers; index -> name
+_PRAGMA_VALUE_NAMES: Dict[str, Tuple[str, ...]] = {
+    "synchronous": ("off", "normal", "full", "extra"),
+    "temp_store": ("default", "file", "memory"),
+}
+
+
+_POOL_LOCK = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    tenant = current_tenant()
+    pool = tenant.extensions.get("sqlite_pool")
+    if pool is None:
+        with _POOL_LOCK:
+            pool = tenant.extensions.get("sqlite_pool")
+            if pool is None:
+                config = tenant.config
+                pool = ConnectionPool(
+                    Path(config["DATABASE"]),
+                    size=config["SQLITE_POOL_SIZE"],
+                    pragmas=pragma_statements(config),
+                    cached_statements=config["SQLITE_STATEMENT_CACHE"],
+                    factory=TimedConnection,
+                )
+                tenant.extensions["sqlite_pool"] = pool
+    return pool
 
 
 def get_db() -> sqlite3.Connection:
     if "db" not in g:
-        db_path: Path = Path(current_app.config["DATABASE"])
-        db_path.parent.mkdir(parents=True, exist_ok=True)
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
-        g.db = conn
+        pool = get_pool()
+        g.db = pool.acquire()
+        # Released to the pool it came from even if the tenant was evicted
+        g.db_pool = pool
     return g.db  # type: ignore[return-value]
 
 
+def pragma_statements(config: Mapping) -> List[str]:
+    statements: List[str] = []
+    for key, (pragma, allowed) in SQLITE_PRAGMAS.items():
+        value = config.get(key)
+        if value is None or value == "":
+            continue
+        if allowed is None:
+            statements.append(f"PRAGMA {pragma} = {int(value)}")
+            continue
+        normalized = str(value).strip().lower()
+        if normalized not in allowed:
+            raise ValueError(f"Unsupported {key} value: {value!r}")
+        statements.append(f"PRAGMA {pragma} = {normalized}")
+    return statements
+
+
+def fetch_pragma_values() -> Dict[str, object]:
+    db = get_db()
+    values: Dict[str, object] = {}
+    for pragma, _ in SQLITE_PRAGMAS.values():
+        row = db.execute(f"PRAGMA {pragma}").fetchone()
+        value = row[0] if row else None
+        names = _PRAGMA_VALUE_NAMES.get(pragma)
+        if names and isinstance(value, int) and 0 <= value < len(names):
+            value = names[value]
+        values[pragma] = value
+    return values
+
+
 def close_db(_: Optional[BaseException] = None) -> None:
     db: Optional[sqlite3.Connection] = g.pop("db", None)
+    pool: Optional[ConnectionPool] = g.pop("db_pool", None)
     if db is not None:
-        db.close()
+        (pool or get_pool()).release(db)
 
 
 def init_db() -> None:
     db = get_db()
+    version = db.execute("PRAGMA user_version").fetchone()[0]
+    for migrate in _MIGRATIONS[version:]:
+        migrate(db)
+    if version < SCHEMA_VERSION:
+        db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    # These depend on settings rather than on the schema version
+    _ensure_phonebook_index(db, tenant_config()["DEFAULT_GROUP_NAME"])
+    _check_number_index(db)
+    db.commit()
+
+
+def _create_contacts(db: sqlite3.Connection) -> None:
     db.execute(
         """
         CREATE TABLE IF NOT EXISTS contacts (
@@ -43,19 +146,589 @@ def init_db() -> None:
         db.execute(
             "ALTER TABLE contacts ADD COLUMN group_name TEXT NOT NULL DEFAULT 'Contacts'"
         )
-    db.commit()
 
 
-def fetch_contacts() -> List[Mapping]:
+def _ensure_search_index(db: sqlite3.Connection) -> None:
+    exists = db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'contacts_fts'"
+    ).fetchone()
+    if not exists:
+        try:
+            # External-content table: the text lives in contacts only. The
+            # prefix index makes "0170*"-style digit-prefix queries index seeks.
+            db.execute(
+                """
+                CREATE VIRTUAL TABLE contacts_fts USING fts5(
+                    name, group_name, telephone, mobile, other,
+                    content='contacts', content_rowid='id', prefix='2 3 4'
+                )
+                """
+            )
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5; _search_filter falls back to LIKE
+            return
+        db.execute("INSERT INTO contacts_fts (contacts_fts) VALUES ('rebuild')")
+    db.executescript(
+        """
+        CREATE TRIGGER IF NOT EXISTS contacts_fts_insert AFTER INSERT ON contacts BEGIN
+            INSERT INTO contacts_fts (rowid, name, group_name, telephone, mobile, other)
+            VALUES (new.id, new.name, new.group_name, new.telephone, new.mobile, new.other);
+        END;
+        CREATE TRIGGER IF NOT EXISTS contacts_fts_delete AFTER DELETE ON contacts BEGIN
+            INSERT INTO contacts_fts
+                (contacts_fts, rowid, name, group_name, telephone, mobile, other)
+            VALUES
+                ('delete', old.id, old.name, old.group_name, old.telephone, old.mobile, old.other);
+        END;
+        CREATE TRIGGER IF NOT EXISTS contacts_fts_update AFTER UPDATE ON contacts BEGIN
+            INSERT INTO contacts_fts
+                (contacts_fts, rowid, name, group_name, telephone, mobile, other)
+            VALUES
+                ('delete', old.id, old.name, old.group_name, old.telephone, old.mobile, old.other);
+            INSERT INTO contacts_fts (rowid, name, group_name, telephone, mobile, other)
+            VALUES (new.id, new.name, new.group_name, new.telephone, new.mobile, new.other);
+        END;
+        """
+    )
+
+
+def _ensure_generation_tracking(db: sqlite3.Connection) -> None:
+    # Every committed change to contacts bumps a single counter, so caches in
+    # any worker can tell cheaply whether they are still current. The same
+    # trigger journals the change under its new generation for /changes.
+    db.execute(
+        "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+    )
+    db.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0)")
+    db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS contact_changes (
+            generation INTEGER PRIMARY KEY,
+            contact_id INTEGER NOT NULL,
+            action TEXT NOT NULL
+        )
+        """
+    )
+    db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_contact_changes_contact "
+        "ON contact_changes (contact_id, generation)"
+    )
+    # Changes made before the journal existed cannot be replayed. Contacts
+    # from before generation tracking sit at generation 0, so move past them
+    # and clients starting from 0 are sent a full snapshot instead.
+    journal_seeded = db.execute("SELECT 1 FROM meta WHERE key = 'changes_floor'").fetchone()
+    if journal_seeded is None and db.execute("SELECT 1 FROM contacts LIMIT 1").fetchone():
+        db.execute("UPDATE meta SET value = value + 1 WHERE key = 'generation'")
+    db.execute(
+        "INSERT OR IGNORE INTO meta (key, value) "
+        "SELECT 'changes_floor', value FROM meta WHERE key = 'generation'"
+    )
+    db.execute(
+        "INSERT OR IGNORE INTO meta (key, value) "
+        "SELECT 'changes_compacted', value FROM meta WHERE key = 'generation'"
+    )
+    for event, row, action in (
+        ("INSERT", "new", "upsert"),
+        ("UPDATE", "new", "upsert"),
+        ("DELETE", "old", "delete"),
+    ):
+        db.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS contacts_journal_{event.lower()}
+            AFTER {event} ON contacts
+            BEGIN
+                UPDATE meta SET value = value + 1 WHERE key = 'generation';
+                INSERT INTO contact_changes (generation, contact_id, action)
+                SELECT value, {row}.id, '{action}' FROM meta WHERE key = 'generation';
+            END
+            """
+        )
+
+
+def _create_number_index(db: sqlite3.Connection) -> None:
+    # Every number variant is stored reversed, so both exact and "ends with"
+    # lookups are range seeks on a single index.
+    db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS contact_numbers (
+            contact_id INTEGER NOT NULL,
+            field TEXT NOT NULL,
+            reversed_digits TEXT NOT NULL
+        )
+        """
+    )
+    db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_contact_numbers_reversed "
+        "ON contact_numbers (reversed_digits, contact_id)"
+    )
+    db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_contact_numbers_contact ON contact_numbers (contact_id)"
+    )
+    db.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS contact_numbers_delete AFTER DELETE ON contacts
+        BEGIN
+            DELETE FROM contact_numbers WHERE contact_id = old.id;
+        END
+        """
+    )
+
+
+def _check_number_index(db: sqlite3.Connection) -> None:
+    state = {
+        row["key"]: row["value"]
+        for row in db.execute(
+            "SELECT key, value FROM meta "
+            "WHERE key IN ('generation', 'numbers_generation', 'numbers_country_code')"
+        )
+    }
+    # Rebuild when contacts changed behind our back (another tool wrote to
+    # the database) or when LOOKUP_COUNTRY_CODE changed.
+    if (
+        state.get("numbers_generation") != state.get("generation")
+        or state.get("numbers_country_code") != _lookup_country_code_value()
+    ):
+        db.execute("DELETE FROM contact_numbers")
+        _reindex_numbers(db, "1")
+
+
+# Schema steps in order; PRAGMA user_version records how many a database has
+# run. Steps stay idempotent because databases from before the versioning
+# start at 0 with part of the schema already in place. Only append here.
+_MIGRATIONS: Tuple[Callable[[sqlite3.Connection], None], ...] = (
+    _create_contacts,
+    _ensure_generation_tracking,
+    _ensure_search_index,
+    _create_number_index,
+)
+SCHEMA_VERSION = len(_MIGRATIONS)
+
+
+def _lookup_country_code() -> str:
+    return number_digits(tenant_config()["LOOKUP_COUNTRY_CODE"])
+
+
+def _lookup_country_code_value() -> int:
+    return int(_lookup_country_code() or 0)
+
+
+def _reindex_numbers(db: sqlite3.Connection, where: str, params: Sequence = ()) -> None:
+    # Call inside the transaction that changed the contacts matched by
+    # `where`; afterwards the number index is marked current again.
+    country_code = _lookup_country_code()
+    db.execute(
+        f"DELETE FROM contact_numbers WHERE contact_id IN (SELECT id FROM contacts WHERE {where})",
+        params,
+    )
+    rows = db.execute(
+        f"SELECT id, telephone, mobile, other FROM contacts WHERE {where}", params
+    ).fetchall()
+    db.executemany(
+        "INSERT INTO contact_numbers (contact_id, field, reversed_digits) VALUES (?, ?, ?)",
+        (
+            (row["id"], field, variant[::-1])
+            for row in rows
+            for field in NUMBER_FIELDS
+            for variant in sorted(number_variants(row[field], country_code))
+        ),
+    )
+    db.execute(
+        "INSERT OR REPLACE INTO meta (key, value) "
+        "SELECT 'numbers_generation', value FROM meta WHERE key = 'generation'"
+    )
+    db.execute(
+        "INSERT OR REPLACE INTO meta (key, value) VALUES ('numbers_country_code', ?)",
+        (_lookup_country_code_value(),),
+    )
+
+
+def fetch_number_matches(
+    number: str,
+    *,
+    suffix_digits: int,
+    limit: int = 10,
+) -> Tuple[Optional[str], List[Dict]]:
+    # Returns ("exact" | "suffix" | None, matches). Suffix matching compares
+    # the last `suffix_digits` digits and only kicks in without an exact hit.
+    variants = number_variants(number, _lookup_country_code())
+    if not variants:
+        return None, []
     db = get_db()
+    select = (
+        "SELECT DISTINCT c.id, c.name, c.group_name, c.telephone, c.mobile, c.other, n.field "
+        "FROM contact_numbers AS n JOIN contacts AS c ON c.id = n.contact_id "
+    )
+    reversed_variants = sorted(variant[::-1] for variant in variants)
+    placeholders = ", ".join("?" for _ in reversed_variants)
     rows = db.execute(
+        select + f"WHERE n.reversed_digits IN ({placeholders}) ORDER BY c.id LIMIT ?",
+        (*reversed_variants, limit),
+    ).fetchall()
+    match = "exact"
+    digits = number_digits(number)
+    if not rows and suffix_digits > 0 and len(digits) >= suffix_digits:
+        prefix = digits[-suffix_digits:][::-1]
+        # ":" sorts right after "9", so this range is every value starting with prefix
+        rows = db.execute(
+            select
+            + "WHERE n.reversed_digits >= ? AND n.reversed_digits < ? ORDER BY c.id LIMIT ?",
+            (prefix, prefix + ":", limit),
+        ).fetchall()
+        match = "suffix"
+    if not rows:
+        return None, []
+    matches = [
+        {
+            "id": row["id"],
+            "name": row["name"],
+            "group_name": row["group_name"],
+            "field": row["field"],
+            "number": row[row["field"]],
+        }
+        for row in rows
+    ]
+    return match, matches
+
+
+def fetch_generation() -> int:
+    row = get_db().execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+    return int(row["value"]) if row else 0
+
+
+class ChangeEntry(NamedTuple):
+    generation: int
+    contact_id: int
+    # None for deletions
+    contact: Optional[sqlite3.Row]
+
+
+def fetch_changes(since: int, *, limit: int) -> Optional[Tuple[int, List[ChangeEntry], bool]]:
+    # Returns (generation, changes, more) or None when changes after `since`
+    # were compacted away and the caller has to start from a full snapshot.
+    # Upserts carry the contact as it is now, which may be newer than the
+    # entry's generation; a later entry for the same contact follows then.
+    db = get_db()
+    with db:
+        db.execute("BEGIN")
+        state = {
+            row["key"]: row["value"]
+            for row in db.execute(
+                "SELECT key, value FROM meta WHERE key IN ('generation', 'changes_floor')"
+            )
+        }
+        generation = int(state.get("generation", 0))
+        if since < int(state.get("changes_floor", 0)) or since > generation:
+            return None
+        rows = db.execute(
+            """
+            SELECT j.generation, j.contact_id, j.action,
+                   c.id, c.name, c.telephone, c.mobile, c.other, c.group_name
+            FROM contact_changes AS j
+            LEFT JOIN contacts AS c ON c.id = j.contact_id AND j.action = 'upsert'
+            WHERE j.generation > ?
+            ORDER BY j.generation
+            LIMIT ?
+            """,
+            (since, limit + 1),
+        ).fetchall()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    changes = [
+        ChangeEntry(
+            row["generation"],
+            row["contact_id"],
+            row if row["action"] == "upsert" else None,
+        )
+        for row in rows
+        # An upsert whose contact is gone is superseded by a later deletion
+        if row["action"] == "delete" or row["id"] is not None
+    ]
+    if more:
+        generation = rows[-1]["generation"]
+    return generation, changes, more
+
+
+def iter_contact_snapshot() -> Tuple[int, sqlite3.Cursor]:
+    # The read transaction stays open while the cursor is consumed, so the
+    # rows match the returned generation; it ends when the connection goes
+    # back to the pool.
+    db = get_db()
+    db.execute("BEGIN")
+    generation = fetch_generation()
+    cursor = db.execute(
+        "SELECT id, name, telephone, mobile, other, group_name FROM contacts ORDER BY id"
+    )
+    return generation, cursor
+
+
+def compact_change_journal(*, retention: int) -> None:
+    # Keeps only the latest entry per contact, which is all a delta needs,
+    # and forgets entries more than `retention` generations old. Only
+    # contacts changed since the previous run are coalesced.
+    db = get_db()
+    with db:
+        compacted = db.execute(
+            "SELECT value FROM meta WHERE key = 'changes_compacted'"
+        ).fetchone()
+        last = int(compacted["value"]) if compacted else 0
+        db.execute(
+            """
+            DELETE FROM contact_changes
+            WHERE contact_id IN (
+                SELECT contact_id FROM contact_changes WHERE generation > :last
+            )
+            AND generation < (
+                SELECT MAX(latest.generation) FROM contact_changes AS latest
+                WHERE latest.contact_id = contact_changes.contact_id
+            )
+            """,
+            {"last": last},
+        )
+        if retention > 0:
+            db.execute(
+                "UPDATE meta SET value = MAX(value, "
+                "(SELECT value FROM meta WHERE key = 'generation') - ?) "
+                "WHERE key = 'changes_floor'",
+                (retention,),
+            )
+            db.execute(
+                "DELETE FROM contact_changes "
+                "WHERE generation <= (SELECT value FROM meta WHERE key = 'changes_floor')"
+            )
+        db.execute(
+            "UPDATE meta SET value = (SELECT value FROM meta WHERE key = 'generation') "
+            "WHERE key = 'changes_compacted'"
+        )
+
+
+def phonebook_group(group_name: Optional[str], default_group: str) -> str:
+    # Python mirror of group_expression for values that never hit SQL.
+    return (group_name or "").strip(" ") or default_group
+
+
+_ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+
+def phonebook_group_sort_key(group_name: str) -> Tuple[str, str]:
+    # Same order as "ORDER BY <group> COLLATE NOCASE, <group>": NOCASE folds
+    # ASCII letters only, and BINARY on UTF-8 follows code point order.
+    return (group_name.translate(_ASCII_LOWER), group_name)
+
+
+def group_expression(default_group: str) -> str:
+    # The default group is inlined rather than bound so the planner can match
+    # the expression against the phonebook index.
+    literal = "'" + default_group.replace("'", "''") + "'"
+    return f"COALESCE(NULLIF(TRIM(group_name), ''), {literal})"
+
+
+def _phonebook_index_sql(default_group: str) -> str:
+    group_expr = group_expression(default_group)
+    return (
+        f"CREATE INDEX {PHONEBOOK_INDEX} ON contacts ("
+        f"{group_expr} COLLATE NOCASE, {group_expr}, "
+        "TRIM(name) COLLATE NOCASE, TRIM(name), id, telephone, mobile, other)"
+    )
+
+
+def _ensure_phonebook_index(db: sqlite3.Connection, default_group: str) -> None:
+    expected_sql = _phonebook_index_sql(default_group)
+    row = db.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'index' AND name = ?",
+        (PHONEBOOK_INDEX,),
+    ).fetchone()
+    if row is not None and row["sql"] == expected_sql:
+        return
+    # DEFAULT_GROUP_NAME is part of the indexed expression; rebuild on change.
+    db.execute(f"DROP INDEX IF EXISTS {PHONEBOOK_INDEX}")
+    db.execute(expected_sql)
+
+
+def iter_phonebook_rows(default_group: str) -> sqlite3.Cursor:
+    group_expr = group_expression(default_group)
+    return get_db().execute(
+        f"""
+        SELECT {group_expr} AS group_name, TRIM(name) AS name, telephone, mobile, other
+        FROM contacts
+        ORDER BY {group_expr} COLLATE NOCASE, {group_expr},
+                 TRIM(name) COLLATE NOCASE, TRIM(name), id
         """
-        SELECT id, name, telephone, mobile, other, group_name
+    )
+
+
+def iter_phonebook_group_rows(
+    group_name: str,
+    default_group: str,
+    *,
+    offset: int = 0,
+    limit: int = -1,
+) -> sqlite3.Cursor:
+    # A negative limit returns the rest of the group
+    group_expr = group_expression(default_group)
+    return get_db().execute(
+        f"""
+        SELECT {group_expr} AS group_name, TRIM(name) AS name, telephone, mobile, other
         FROM contacts
-        ORDER BY group_name COLLATE NOCASE, name COLLATE NOCASE
+        WHERE {group_expr} COLLATE NOCASE = ?1 AND {group_expr} = ?1
+        ORDER BY TRIM(name) COLLATE NOCASE, TRIM(name), id
+        LIMIT ?2 OFFSET ?3
+        """,
+        (group_name, limit, offset),
+    )
+
+
+class ContactSummary:
+    # The parts of the list page that need the whole table, built once per
+    # generation and shared by every request until the next change.
+    __slots__ = ("generation", "group_names", "total", "build_seconds")
+
+    def __init__(
+        self,
+        generation: int,
+        group_names: Tuple[str, ...],
+        total: int,
+        build_seconds: float,
+    ) -> None:
+        self.generation = generation
+        self.group_names = group_names
+        self.total = total
+        self.build_seconds = build_seconds
+
+    def size_bytes(self) -> int:
+        return (
+            sys.getsizeof(self)
+            + sys.getsizeof(self.group_names)
+            + sum(sys.getsizeof(name) for name in self.group_names)
+        )
+
+
+def fetch_contact_summary(default_group: str) -> ContactSummary:
+    started = time.perf_counter()
+    # Read first: a change landing in between only makes the summary newer
+    # than its label, and the next request rebuilds it.
+    generation = fetch_generation()
+    group_expr = group_expression(default_group)
+    rows = get_db().execute(
+        f"""
+        SELECT {group_expr} AS group_name, COUNT(*) AS contacts
+        FROM contacts
+        GROUP BY {group_expr} COLLATE NOCASE, {group_expr}
+        ORDER BY {group_expr} COLLATE NOCASE, {group_expr}
         """
     ).fetchall()
-    return [dict(row) for row in rows]
+    return ContactSummary(
+        generation,
+        # Interned so every summary and tenant shares one copy of each name
+        tuple(sys.intern(row["group_name"]) for row in rows),
+        sum(row["contacts"] for row in rows),
+        time.perf_counter() - started,
+    )
+
+
+class PageKey(NamedTuple):
+    # Position of a row in list order: effective group, trimmed name, id
+    group: str
+    name: str
+    id: int
+
+
+def _has_search_index(db: sqlite3.Connection) -> bool:
+    row = db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'contacts_fts'"
+    ).fetchone()
+    return row is not None
+
+
+def _search_filter(db: sqlite3.Connection, search: str) -> Tuple[str, List[str]]:
+    terms = search.split()
+    if not terms:
+        return "", []
+    if _has_search_index(db):
+        # Every term becomes a quoted prefix phrase, so user input never reaches
+        # the FTS5 query syntax; "+4940" matches any number starting 4940.
+        match = " ".join('"' + term.replace('"', '""') + '"*' for term in terms)
+        return "id IN (SELECT rowid FROM contacts_fts WHERE contacts_fts MATCH ?)", [match]
+    clauses: List[str] = []
+    params: List[str] = []
+    for term in terms:
+        pattern = "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        clauses.append(
+            "(" + " OR ".join(
+                f"{column} LIKE ? ESCAPE '\\'"
+                for column in ("name", "group_name", "telephone", "mobile", "other")
+            ) + ")"
+        )
+        params.extend([pattern] * 5)
+    return " AND ".join(clauses), params
+
+
+def count_contacts(search: str = "") -> int:
+    db = get_db()
+    where, params = _search_filter(db, search)
+    sql = "SELECT COUNT(*) FROM contacts" + (f" WHERE {where}" if where else "")
+    return int(db.execute(sql, params).fetchone()[0])
+
+
+def fetch_contact_page(
+    default_group: str,
+    *,
+    limit: int,
+    search: str = "",
+    after: Optional[PageKey] = None,
+    before: Optional[PageKey] = None,
+) -> Tuple[List[Dict], bool]:
+    # Keyset pagination in phonebook order. Returns at most `limit` rows in
+    # display order and whether more rows exist beyond them in the direction
+    # travelled (after the page, or before it when paging backwards).
+    db = get_db()
+    group_expr = group_expression(default_group)
+    key_columns = (
+        f"{group_expr} COLLATE NOCASE",
+        group_expr,
+        "TRIM(name) COLLATE NOCASE",
+        "TRIM(name)",
+        "id",
+    )
+    backward = before is not None
+    cursor_key = before if backward else after
+    direction = " DESC" if backward else ""
+    search_where, search_params = _search_filter(db, search)
+
+    # A row-value comparison over expressions is not an index seek, so the
+    # "after this key" condition is split into one seekable query per key
+    # column: equal prefix, then strictly greater (or smaller) on the next.
+    # The equal prefix is left out of ORDER BY, otherwise SQLite sorts in a
+    # temp b-tree instead of walking the index.
+    parts: List[Tuple[str, List, int]] = [("", [], 0)]
+    if cursor_key is not None:
+        group, name = cursor_key.group, cursor_key.name
+        values = (group, group, name, name, cursor_key.id)
+        comparison = "<" if backward else ">"
+        parts = []
+        for depth in range(len(key_columns) - 1, -1, -1):
+            conditions = [f"{column} = ?" for column in key_columns[:depth]]
+            conditions.append(f"{key_columns[depth]} {comparison} ?")
+            parts.append((" AND ".join(conditions), list(values[: depth + 1]), depth))
+
+    rows: List[Dict] = []
+    for where, params, depth in parts:
+        order_by = ", ".join(column + direction for column in key_columns[depth:])
+        clauses = [clause for clause in (where, search_where) if clause]
+        sql = (
+            f"SELECT id, name, telephone, mobile, other, group_name, "
+            f"{group_expr} AS sort_group, TRIM(name) AS sort_name FROM contacts"
+            + (" WHERE " + " AND ".join(clauses) if clauses else "")
+            + f" ORDER BY {order_by} LIMIT ?"
+        )
+        cursor = db.execute(sql, [*params, *search_params, limit + 1 - len(rows)])
+        rows.extend(dict(row) for row in cursor)
+        if len(rows) > limit:
+            break
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backward:
+        rows.reverse()
+    return rows, has_more
 
 
 def fetch_contact(contact_id: int) -> Optional[Mapping]:
@@ -71,22 +744,119 @@ def fetch_contact(contact_id: int) -> Optional[Mapping]:
     return dict(row) if row else None
 
 
+def iter_contacts() -> sqlite3.Cursor:
+    return get_db().execute(
+        """
+        SELECT id, name, telephone, mobile, other, group_name
+        FROM contacts
+        ORDER BY group_name COLLATE NOCASE, name COLLATE NOCASE
+        """
+    )
+
+
+def insert_contacts(records: Iterable[Mapping]) -> int:
+    db = get_db()
+    with db:
+        last_id = db.execute("SELECT COALESCE(MAX(id), 0) FROM contacts").fetchone()[0]
+        cursor = db.executemany(
+            """
+            INSERT INTO contacts (name, telephone, mobile, other, group_name)
+            VALUES (:name, :telephone, :mobile, :other, :group_name)
+            """,
+            (
+                {
+                    "name": record["name"],
+                    "telephone": record["telephone"] or None,
+                    "mobile": record["mobile"] or None,
+                    "other": record["other"] or None,
+                    "group_name": record["group_name"],
+                }
+                for record in records
+            ),
+        )
+        _reindex_numbers(db, "id > ?", (last_id,))
+    return cursor.rowcount
+
+
+class ContactChange(NamedTuple):
+    action: str  # "create", "update" or "delete"
+    contact_id: Optional[int] = None
+    values: Optional[Mapping[str, str]] = None
+
+
+class ChangeResult(NamedTuple):
+    contact_id: int
+    # Group before and after the change; None where the contact did not exist
+    previous_group: Optional[str]
+    group: Optional[str]
+
+
+def _insert_contact(db: sqlite3.Connection, values: Mapping[str, str]) -> int:
+    cursor = db.execute(
+        """
+        INSERT INTO contacts (name, telephone, mobile, other, group_name)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        (
+            values["name"],
+            values["telephone"] or None,
+            values["mobile"] or None,
+            values["other"] or None,
+            values["group_name"],
+        ),
+    )
+    contact_id = int(cursor.lastrowid)
+    _reindex_numbers(db, "id = ?", (contact_id,))
+    return contact_id
+
+
+def _update_contact(db: sqlite3.Connection, contact_id: int, values: Mapping[str, str]) -> bool:
+    cursor = db.execute(
+        """
+        UPDATE contacts
+        SET name = ?, telephone = ?, mobile = ?, other = ?, group_name = ?
+        WHERE id = ?
+        """,
+        (
+            values["name"],
+            values["telephone"] or None,
+            values["mobile"] or None,
+            values["other"] or None,
+            values["group_name"],
+            contact_id,
+        ),
+    )
+    _reindex_numbers(db, "id = ?", (contact_id,))
+    return cursor.rowcount > 0
+
+
+def _delete_contact(db: sqlite3.Connection, contact_id: int) -> bool:
+    cursor = db.execute("DELETE FROM contacts WHERE id = ?", (contact_id,))
+    # The delete trigger already dropped the numbers; this marks the index current
+    _reindex_numbers(db, "id = ?", (contact_id,))
+    return cursor.rowcount > 0
+
+
 def insert_contact(
     name: str,
     telephone: str,
     mobile: str,
     other: str,
     group_name: str,
-) -> None:
+) -> int:
     db = get_db()
-    db.execute(
-        """
-        INSERT INTO contacts (name, telephone, mobile, other, group_name)
-        VALUES (?, ?, ?, ?, ?)
-        """,
-        (name, telephone or None, mobile or None, other or None, group_name),
+    contact_id = _insert_contact(
+        db,
+        {
+            "name": name,
+            "telephone": telephone,
+            "mobile": mobile,
+            "other": other,
+            "group_name": group_name,
+        },
     )
     db.commit()
+    return contact_id
 
 
 def update_contact(
@@ -98,19 +868,58 @@ def update_contact(
     group_name: str,
 ) -> bool:
     db = get_db()
-    cursor = db.execute(
-        """
-        UPDATE contacts
-        SET name = ?, telephone = ?, mobile = ?, other = ?, group_name = ?
-        WHERE id = ?
-        """,
-        (name, telephone or None, mobile or None, other or None, group_name, contact_id),
+    was_updated = _update_contact(
+        db,
+        contact_id,
+        {
+            "name": name,
+            "telephone": telephone,
+            "mobile": mobile,
+            "other": other,
+            "group_name": group_name,
+        },
     )
     db.commit()
-    return cursor.rowcount > 0
+    return was_updated
 
 
 def delete_contact(contact_id: int) -> None:
     db = get_db()
-    db.execute("DELETE FROM contacts WHERE id = ?", (contact_id,))
+    _delete_contact(db, contact_id)
     db.commit()
+
+
+def apply_contact_changes(changes: Iterable[ContactChange]) -> List[Optional[ChangeResult]]:
+    # All or nothing in a single transaction: if an update or delete targets
+    # a contact that does not exist, its entry is None and every change is
+    # rolled back.
+    db = get_db()
+    results: List[Optional[ChangeResult]] = []
+    try:
+        for change in changes:
+            values = change.values or {}
+            if change.action == "create":
+                contact_id = _insert_contact(db, values)
+                results.append(ChangeResult(contact_id, None, values["group_name"]))
+                continue
+            row = db.execute(
+                "SELECT group_name FROM contacts WHERE id = ?", (change.contact_id,)
+            ).fetchone()
+            if row is None or change.contact_id is None:
+                results.append(None)
+            elif change.action == "update":
+                _update_contact(db, change.contact_id, values)
+                results.append(
+                    ChangeResult(change.contact_id, row["group_name"], values["group_name"])
+                )
+            else:
+                _delete_contact(db, change.contact_id)
+                results.append(ChangeResult(change.contact_id, row["group_name"], None))
+        if any(result is None for result in results):
+            db.rollback()
+        else:
+            db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+    return results
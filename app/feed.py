@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import BinaryIO, Dict, Optional, Tuple
+
+from .locking import file_lock
+from .xml_utils import (
+    COMPRESSED_SUFFIXES,
+    compress_variants,
+    compressed_variant_path,
+    read_generation,
+    swap_lock_path,
+)
+
+StatKey = Tuple[int, int, int]
+
+
+@dataclass(frozen=True)
+class FeedSnapshot:
+    body: bytes
+    etag: str
+    last_modified: datetime
+    # None for feeds rendered in memory rather than read from disk
+    stat_key: Optional[StatKey]
+    variants: Dict[str, bytes]
+    generation: int
+
+    def select(self, encoding: Optional[str]) -> Tuple[bytes, str]:
+        if encoding and encoding in self.variants:
+            return self.variants[encoding], f"{self.etag}-{encoding}"
+        return self.body, self.etag
+
+
+_LOCK = threading.Lock()
+# Least recently served last; bounded by the bytes held, not the number of
+# feeds, since a multi-tenant process serves many books of very different size.
+_SNAPSHOTS: "OrderedDict[str, FeedSnapshot]" = OrderedDict()
+_snapshot_bytes = 0
+_snapshot_budget = 64 * 1024 * 1024
+
+
+def set_snapshot_budget(max_bytes: int) -> None:
+    global _snapshot_budget
+    with _LOCK:
+        _snapshot_budget = max(max_bytes, 0)
+        _evict()
+
+
+def _snapshot_size(snapshot: FeedSnapshot) -> int:
+    return len(snapshot.body) + sum(len(variant) for variant in snapshot.variants.values())
+
+
+def _forget(key: str) -> None:
+    global _snapshot_bytes
+    old = _SNAPSHOTS.pop(key, None)
+    if old is not None:
+        _snapshot_bytes -= _snapshot_size(old)
+
+
+def _remember(key: str, snapshot: FeedSnapshot) -> None:
+    global _snapshot_bytes
+    _forget(key)
+    _SNAPSHOTS[key] = snapshot
+    _snapshot_bytes += _snapshot_size(snapshot)
+    _evict()
+
+
+def _evict() -> None:
+    # The most recent snapshot stays even if it alone exceeds the budget
+    while _snapshot_bytes > _snapshot_budget and len(_SNAPSHOTS) > 1:
+        _forget(next(iter(_SNAPSHOTS)))
+
+
+def _stat_key(stat_result: os.stat_result) -> StatKey:
+    return (stat_result.st_ino, stat_result.st_mtime_ns, stat_result.st_size)
+
+
+def _etag(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()[:32]
+
+
+def _read_snapshot(path: Path) -> Optional[FeedSnapshot]:
+    # Open the XML and its sidecars while no publisher is swapping files, so
+    # every variant belongs to the same generation; read them afterwards.
+    handles: Dict[str, BinaryIO] = {}
+    with file_lock(swap_lock_path(path), shared=True):
+        try:
+            handle = path.open("rb")
+        except FileNotFoundError:
+            return None
+        generation = read_generation(path)
+        for encoding in COMPRESSED_SUFFIXES:
+            try:
+                handles[encoding] = compressed_variant_path(path, encoding).open("rb")
+            except FileNotFoundError:
+                continue
+    with handle:
+        stat_result = os.fstat(handle.fileno())
+        body = handle.read()
+    variants: Dict[str, bytes] = {}
+    for encoding, variant_handle in handles.items():
+        with variant_handle:
+            variants[encoding] = variant_handle.read()
+    return FeedSnapshot(
+        body=body,
+        etag=_etag(body),
+        last_modified=datetime.fromtimestamp(stat_result.st_mtime, tz=timezone.utc),
+        stat_key=_stat_key(stat_result),
+        variants=variants,
+        generation=generation,
+    )
+
+
+def build_feed_snapshot(body: bytes, generation: int) -> FeedSnapshot:
+    return FeedSnapshot(
+        body=body,
+        etag=_etag(body),
+        last_modified=datetime.now(timezone.utc).replace(microsecond=0),
+        stat_key=None,
+        variants=compress_variants(body),
+        generation=generation,
+    )
+
+
+def negotiate_encoding(snapshot: FeedSnapshot, accept_encodings) -> Optional[str]:
+    available = [encoding for encoding in COMPRESSED_SUFFIXES if encoding in snapshot.variants]
+    if not available:
+        return None
+    return accept_encodings.best_match(available)
+
+
+def refresh_feed_snapshot(path: Path) -> Optional[FeedSnapshot]:
+    with _LOCK:
+        snapshot = _read_snapshot(path)
+        if snapshot is None:
+            _forget(str(path))
+        else:
+            _remember(str(path), snapshot)
+    return snapshot
+
+
+def get_feed_snapshot(path: Path) -> Optional[FeedSnapshot]:
+    # Other workers publish to the same file, so a single stat decides whether
+    # the cached bytes are still current; every publish replaces the inode.
+    snapshot = _SNAPSHOTS.get(str(path))
+    try:
+        stat_key = _stat_key(path.stat())
+    except FileNotFoundError:
+        return None
+    if snapshot is not None and snapshot.stat_key == stat_key:
+        with _LOCK:
+            if str(path) in _SNAPSHOTS:
+                _SNAPSHOTS.move_to_end(str(path))
+        return snapshot
+    return refresh_feed_snapshot(path)
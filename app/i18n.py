@@ -1,6 +1,9 @@
 from __future__ import annotations
 
-from typing import Dict, Mapping, Optional
+from types import MappingProxyType
+from typing import Dict, Iterator, Mapping, Optional
+
+from markupsafe import escape
 
 DEFAULT_LANGUAGE = "en"
 
@@ -45,6 +48,7 @@ _TRANSLATIONS: Dict[str, Dict[str, Mapping[str, str]]] = {
             "status_new_release": "New release available",
             "status_unreachable": "Status temporarily unavailable",
             "status_unknown": "Status unknown",
+            "status_pending": "Checking for updates…",
             "version_prefix": "Version",
             "help_heading": "Configure Yealink remote phonebook",
             "help_step1": "Open the Yealink web interface and sign in as administrator.",
@@ -55,6 +59,19 @@ _TRANSLATIONS: Dict[str, Dict[str, Mapping[str, str]]] = {
             "no_contacts_message": "The phonebook is empty. Use the form above to add the first entry.",
             "language_label": "Language",
             "footer_prefix": "M Quadrat IT Consult · Ahrensburg · Marcin Litwiński ·",
+            "transfer_title": "Import & export",
+            "import_label": "CSV or vCard file",
+            "import_hint": "CSV columns: name, group_name, telephone, mobile, other. vCard files (.vcf) are detected automatically.",
+            "import_submit": "Import contacts",
+            "export_csv_label": "Export CSV",
+            "export_vcard_label": "Export vCard",
+            "search_label": "Search contacts",
+            "search_placeholder": "Name, group or number prefix",
+            "search_submit": "Search",
+            "search_clear": "Clear",
+            "pager_previous": "← Previous",
+            "pager_next": "Next →",
+            "no_results_message": "No contacts match your search.",
         },
         "messages": {
             "contact_name_required": "Contact name is required.",
@@ -64,6 +81,11 @@ _TRANSLATIONS: Dict[str, Dict[str, Mapping[str, str]]] = {
             "contact_missing": "The selected contact could not be found.",
             "invalid_phone": "Invalid phone number in fields: {fields}. Use only + and digits.",
             "editing_contact": "Editing contact: {name}",
+            "import_missing_file": "Choose a CSV or vCard file to import.",
+            "import_done": "Imported {count} contacts, skipped {skipped} invalid entries.",
+            "import_unreadable": "The file could not be read; import stopped after {count} contacts.",
+            "list_summary": "Showing {shown} of {total} contacts.",
+            "search_summary": "{matches} of {total} contacts match “{query}”.",
         },
     },
     "de": {
@@ -106,6 +128,7 @@ _TRANSLATIONS: Dict[str, Dict[str, Mapping[str, str]]] = {
             "status_new_release": "Neue Version verfügbar",
             "status_unreachable": "Status vorübergehend nicht verfügbar",
             "status_unknown": "Status unbekannt",
+            "status_pending": "Suche nach Updates…",
             "version_prefix": "Version",
             "help_heading": "Yealink-Remote-Telefonbuch konfigurieren",
             "help_step1": "Öffnen Sie die Yealink-Weboberfläche und melden Sie sich als Administrator an.",
@@ -116,6 +139,19 @@ _TRANSLATIONS: Dict[str, Dict[str, Mapping[str, str]]] = {
             "no_contacts_message": "Das Telefonbuch ist leer. Bitte fügen Sie oben den ersten Eintrag hinzu.",
             "language_label": "Sprache",
             "footer_prefix": "M Quadrat IT Consult · Ahrensburg · Marcin Litwiński ·",
+            "transfer_title": "Import & Export",
+            "import_label": "CSV- oder vCard-Datei",
+            "import_hint": "CSV-Spalten: name, group_name, telephone, mobile, other. vCard-Dateien (.vcf) werden automatisch erkannt.",
+            "import_submit": "Kontakte importieren",
+            "export_csv_label": "Als CSV exportieren",
+            "export_vcard_label": "Als vCard exportieren",
+            "search_label": "Kontakte suchen",
+            "search_placeholder": "Name, Gruppe oder Nummernanfang",
+            "search_submit": "Suchen",
+            "search_clear": "Zurücksetzen",
+            "pager_previous": "← Zurück",
+            "pager_next": "Weiter →",
+            "no_results_message": "Keine Kontakte entsprechen Ihrer Suche.",
         },
         "messages": {
             "contact_name_required": "Der Kontaktname ist erforderlich.",
@@ -125,6 +161,11 @@ _TRANSLATIONS: Dict[str, Dict[str, Mapping[str, str]]] = {
             "contact_missing": "Der ausgewählte Kontakt wurde nicht gefunden.",
             "invalid_phone": "Ungültige Telefonnummer in den Feldern: {fields}. Erlaubt sind nur + und Ziffern.",
             "editing_contact": "Kontakt wird bearbeitet: {name}",
+            "import_missing_file": "Bitte wählen Sie eine CSV- oder vCard-Datei für den Import aus.",
+            "import_done": "{count} Kontakte importiert, {skipped} ungültige Einträge übersprungen.",
+            "import_unreadable": "Die Datei konnte nicht gelesen werden; der Import wurde nach {count} Kontakten abgebrochen.",
+            "list_summary": "{shown} von {total} Kontakten werden angezeigt.",
+            "search_summary": "{matches} von {total} Kontakten passen zu „{query}“.",
         },
     },
     "pl": {
@@ -167,6 +208,7 @@ _TRANSLATIONS: Dict[str, Dict[str, Mapping[str, str]]] = {
             "status_new_release": "Dostępna nowa wersja",
             "status_unreachable": "Status chwilowo niedostępny",
             "status_unknown": "Status nieznany",
+            "status_pending": "Sprawdzanie aktualizacji…",
             "version_prefix": "Wersja",
             "help_heading": "Konfiguracja zdalnej książki Yealink",
             "help_step1": "Otwórz panel WWW Yealink i zaloguj się jako administrator.",
@@ -177,6 +219,19 @@ _TRANSLATIONS: Dict[str, Dict[str, Mapping[str, str]]] = {
             "no_contacts_message": "Książka jest pusta. Dodaj pierwszy wpis w formularzu powyżej.",
             "language_label": "Język",
             "footer_prefix": "M Quadrat IT Consult · Ahrensburg · Marcin Litwiński ·",
+            "transfer_title": "Import i eksport",
+            "import_label": "Plik CSV lub vCard",
+            "import_hint": "Kolumny CSV: name, group_name, telephone, mobile, other. Pliki vCard (.vcf) są rozpoznawane automatycznie.",
+            "import_submit": "Importuj kontakty",
+            "export_csv_label": "Eksportuj CSV",
+            "export_vcard_label": "Eksportuj vCard",
+            "search_label": "Szukaj kontaktów",
+            "search_placeholder": "Nazwa, grupa lub początek numeru",
+            "search_submit": "Szukaj",
+            "search_clear": "Wyczyść",
+            "pager_previous": "← Poprzednia",
+            "pager_next": "Następna →",
+            "no_results_message": "Żaden kontakt nie pasuje do wyszukiwania.",
         },
         "messages": {
             "contact_name_required": "Nazwa kontaktu jest wymagana.",
@@ -186,11 +241,64 @@ _TRANSLATIONS: Dict[str, Dict[str, Mapping[str, str]]] = {
             "contact_missing": "Wybrany kontakt nie został znaleziony.",
             "invalid_phone": "Nieprawidłowy numer telefonu w polach: {fields}. Dozwolone są tylko + oraz cyfry.",
             "editing_contact": "Edycja kontaktu: {name}",
+            "import_missing_file": "Wybierz plik CSV lub vCard do zaimportowania.",
+            "import_done": "Zaimportowano kontakty: {count}, pominięto nieprawidłowe wpisy: {skipped}.",
+            "import_unreadable": "Nie udało się odczytać pliku; import przerwano po {count} kontaktach.",
+            "list_summary": "Wyświetlono {shown} z {total} kontaktów.",
+            "search_summary": "{matches} z {total} kontaktów pasuje do „{query}”.",
         },
     },
 }
 
 
+class FrozenStrings(Mapping[str, str]):
+    # Read-only bundle whose entries also read as attributes, so templates can
+    # write `ui.key`. Kept apart from the instance attributes so a key such
+    # as "get" or "items" cannot hide the Mapping method of that name.
+    __slots__ = ("_strings",)
+
+    def __init__(self, strings: Mapping[str, str]) -> None:
+        object.__setattr__(self, "_strings", dict(strings))
+
+    def __setattr__(self, name: str, value: object) -> None:
+        raise AttributeError("translation bundles are read-only")
+
+    def __getattr__(self, name: str) -> str:
+        # Only reached when normal lookup fails, i.e. for translation keys
+        if name.startswith("_"):
+            raise AttributeError(name)
+        try:
+            return self._strings[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __getitem__(self, key: str) -> str:
+        return self._strings[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._strings)
+
+    def __len__(self) -> int:
+        return len(self._strings)
+
+
+# Built once at import: translations never change while the app runs.
+_UI: Dict[str, FrozenStrings] = {
+    code: FrozenStrings(data["ui"]) for code, data in _TRANSLATIONS.items()
+}
+# HTML-escaped copies for templates; autoescaping leaves Markup untouched.
+_UI_MARKUP: Dict[str, FrozenStrings] = {
+    code: FrozenStrings({key: escape(value) for key, value in data["ui"].items()})
+    for code, data in _TRANSLATIONS.items()
+}
+_MESSAGES: Dict[str, Mapping[str, str]] = {
+    code: MappingProxyType(dict(data["messages"])) for code, data in _TRANSLATIONS.items()
+}
+_LANGUAGE_OPTIONS: Mapping[str, str] = MappingProxyType(
+    {code: data["label"] for code, data in _TRANSLATIONS.items()}
+)
+
+
 def resolve_language(code: Optional[str]) -> str:
     if code and code in _TRANSLATIONS:
         return code
@@ -199,17 +307,21 @@ def resolve_language(code: Optional[str]) -> str:
 
 def get_translations(code: Optional[str]) -> Mapping[str, Mapping[str, str]]:
     language = resolve_language(code)
-    return _TRANSLATIONS[language]
+    return MappingProxyType({"ui": _UI[language], "messages": _MESSAGES[language]})
 
 
 def get_ui_strings(code: Optional[str]) -> Mapping[str, str]:
-    return get_translations(code)["ui"]
+    return _UI[resolve_language(code)]
+
+
+def get_ui_markup(code: Optional[str]) -> Mapping[str, str]:
+    return _UI_MARKUP[resolve_language(code)]
 
 
 def get_message(code: Optional[str], key: str, **kwargs) -> str:
-    template = get_translations(code)["messages"][key]
+    template = _MESSAGES[resolve_language(code)][key]
     return template.format(**kwargs)
 
 
 def get_language_options() -> Mapping[str, str]:
-    return {code: data["label"] for code, data in _TRANSLATIONS.items()}
+    return _LANGUAGE_OPTIONS
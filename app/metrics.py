@@ -0,0 +1,374 @@
+from __future__ import annotations
+
+import atexit
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from pathlib import Path
+from typing import ContextManager, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from .locking import file_lock
+from .xml_utils import write_atomic
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8)
+
+# (metric name, label values) -> counter value, or bucket counts + [sum, count]
+SampleKey = Tuple[str, Tuple[str, ...]]
+Store = Dict[SampleKey, Union[float, List[float]]]
+
+_METRICS: Dict[str, "_Metric"] = {}
+# Reentrant: a store may be retired by the garbage collector while this
+# thread already holds the lock.
+_REGISTRY_LOCK = threading.RLock()
+# Every thread writes to its own store, so recording never takes a lock;
+# collection sums the stores that belong to the current process.
+_STORES: List[Tuple[int, Store]] = []
+# Counts of threads that have finished, per process
+_RETIRED: Dict[int, Store] = {}
+_LOCAL = threading.local()
+
+
+class _StoreHandle:
+    # Held only by the thread-local, so it is released when its thread ends
+    # and the store can be folded into the process total.
+    __slots__ = ("pid", "store", "__weakref__")
+
+    def __init__(self, pid: int) -> None:
+        self.pid = pid
+        self.store: Store = {}
+
+
+def _thread_store() -> Store:
+    pid = os.getpid()
+    handle = getattr(_LOCAL, "handle", None)
+    if handle is None or handle.pid != pid:
+        # New thread, or the first use in a forked worker: the parent's
+        # counts must not be reported a second time.
+        handle = _StoreHandle(pid)
+        with _REGISTRY_LOCK:
+            _STORES[:] = [entry for entry in _STORES if entry[0] == pid]
+            for owner in [owner for owner in _RETIRED if owner != pid]:
+                del _RETIRED[owner]
+            _STORES.append((pid, handle.store))
+        weakref.finalize(handle, _retire, pid, handle.store)
+        _LOCAL.handle = handle
+    return handle.store
+
+
+def _retire(pid: int, store: Store) -> None:
+    with _REGISTRY_LOCK:
+        if not any(entry[1] is store for entry in _STORES):
+            return
+        _merge(_RETIRED.setdefault(pid, {}), list(store.items()))
+        _STORES[:] = [entry for entry in _STORES if entry[1] is not store]
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        with _REGISTRY_LOCK:
+            _METRICS[name] = self
+
+    def _key(self, labels: Dict[str, str]) -> SampleKey:
+        return (self.name, tuple(str(labels.get(label, "")) for label in self.labelnames))
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        store = _thread_store()
+        key = self._key(labels)
+        store[key] = store.get(key, 0.0) + amount  # type: ignore[operator]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels: str) -> None:
+        store = _thread_store()
+        key = self._key(labels)
+        sample = store.get(key)
+        if sample is None:
+            sample = store[key] = [0.0] * (len(self.buckets) + 2)
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                sample[index] += 1  # type: ignore[index]
+                break
+        sample[-2] += value  # type: ignore[index]
+        sample[-1] += 1  # type: ignore[index]
+
+
+def _merge(target: Store, source: Iterable[Tuple[SampleKey, Union[float, List[float]]]]) -> None:
+    for key, value in source:
+        if isinstance(value, list):
+            current = target.get(key)
+            if isinstance(current, list) and len(current) == len(value):
+                target[key] = [a + b for a, b in zip(current, value)]
+            else:
+                target[key] = list(value)
+        else:
+            target[key] = float(target.get(key, 0.0)) + value  # type: ignore[arg-type]
+
+
+def collect_local() -> Store:
+    pid = os.getpid()
+    merged: Store = {}
+    # Under the lock, so a finishing thread is counted exactly once
+    with _REGISTRY_LOCK:
+        stores = [store for owner, store in _STORES if owner == pid]
+        stores.append(_RETIRED.get(pid, {}))
+        for store in stores:
+            while True:
+                try:
+                    items = list(store.items())
+                    break
+                except RuntimeError:  # the owning thread added a key meanwhile
+                    continue
+            _merge(merged, items)
+    return merged
+
+
+class MultiprocessExporter:
+    # Gunicorn workers do not share memory, so each serving worker dumps its
+    # totals to <directory>/<pid>.json and /metrics sums every file. A worker
+    # that exits folds its totals into retired.json and removes its file, so
+    # counters stay monotonic across restarts without a file per dead worker.
+    # Liveness is checked by pid, so the directory belongs to one host.
+    def __init__(self, directory: Path, *, interval: float) -> None:
+        self.directory = directory
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_pid: Optional[int] = None
+        self._closed_pid: Optional[int] = None
+
+    def ensure_running(self) -> None:
+        # Called once a worker has served a request; processes that only
+        # import the app never write anything.
+        pid = os.getpid()
+        if self._thread is not None and self._thread_pid == pid and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread_pid == pid and self._thread.is_alive():
+                return
+            if self._thread_pid != pid:
+                with self._directory_lock():
+                    # Left behind by a killed process whose pid we now reuse
+                    self._retire(self._path(pid))
+                atexit.register(self.close)
+            self._thread = threading.Thread(target=self._run, name="metrics-flush", daemon=True)
+            self._thread_pid = pid
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def _path(self, pid: int) -> Path:
+        return self.directory / f"{pid}.json"
+
+    def _retired_path(self) -> Path:
+        return self.directory / "retired.json"
+
+    def _directory_lock(self) -> ContextManager[None]:
+        return file_lock(self.directory / ".lock")
+
+    def flush(self) -> None:
+        samples = collect_local()
+        if not samples:
+            return
+        with self._directory_lock():
+            if self._closed_pid != os.getpid():
+                _write_samples(self._path(os.getpid()), samples)
+
+    def close(self) -> None:
+        pid = os.getpid()
+        if self._thread_pid != pid or self._closed_pid == pid:
+            return
+        with self._directory_lock():
+            self._closed_pid = pid
+            retired = _read_samples(self._retired_path())
+            _merge(retired, collect_local().items())
+            _write_samples(self._retired_path(), retired)
+            self._path(pid).unlink(missing_ok=True)
+
+    def _retire(self, path: Path) -> None:
+        # Call with the directory lock held
+        samples = _read_samples(path)
+        if samples:
+            retired = _read_samples(self._retired_path())
+            _merge(retired, samples.items())
+            _write_samples(self._retired_path(), retired)
+        path.unlink(missing_ok=True)
+
+    def collect(self) -> Store:
+        merged: Store = {}
+        own = self._path(os.getpid())
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with self._directory_lock():
+            for path in self.directory.glob("*.json"):
+                if path == own or not path.stem.isdigit():
+                    continue
+                if not _process_exists(int(path.stem)):
+                    self._retire(path)
+                    continue
+                _merge(merged, _read_samples(path).items())
+            # Read last: it may just have grown by a worker folded in above
+            _merge(merged, _read_samples(self._retired_path()).items())
+        # This worker's live numbers instead of its possibly older file
+        _merge(merged, collect_local().items())
+        return merged
+
+
+def _process_exists(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # alive, but owned by another user
+        return True
+    return True
+
+
+def _read_samples(path: Path) -> Store:
+    try:
+        samples = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return {(name, tuple(labels)): value for name, labels, value in samples}
+
+
+def _write_samples(path: Path, samples: Store) -> None:
+    rows = [[name, list(labels), value] for (name, labels), value in samples.items()]
+    write_atomic(path, json.dumps(rows).encode("utf-8"))
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def render_text(samples: Store) -> str:
+    # Prometheus text exposition format 0.0.4
+    by_metric: Dict[str, List[Tuple[Tuple[str, ...], Union[float, List[float]]]]] = {}
+    for (name, labels), value in samples.items():
+        by_metric.setdefault(name, []).append((labels, value))
+    lines: List[str] = []
+    for name in sorted(_METRICS):
+        metric = _METRICS[name]
+        lines.append(f"# HELP {name} {metric.documentation}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        for labels, value in sorted(by_metric.get(name, []), key=lambda item: item[0]):
+            if isinstance(metric, Histogram) and isinstance(value, list):
+                plain = _labels(metric.labelnames, labels)
+                cumulative = 0.0
+                for bound, count in zip(metric.buckets, value):
+                    cumulative += count
+                    bucket = _labels(metric.labelnames, labels, f'le="{_number(bound)}"')
+                    lines.append(f"{name}_bucket{bucket} {_number(cumulative)}")
+                bucket = _labels(metric.labelnames, labels, 'le="+Inf"')
+                lines.append(f"{name}_bucket{bucket} {_number(value[-1])}")
+                lines.append(f"{name}_sum{plain} {_number(value[-2])}")
+                lines.append(f"{name}_count{plain} {_number(value[-1])}")
+            elif not isinstance(value, list):
+                lines.append(f"{name}{_labels(metric.labelnames, labels)} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+class TimedConnection(sqlite3.Connection):
+    # Records how long each statement takes to execute (its first step; rows
+    # fetched later from the cursor are not included).
+    def execute(self, sql: str, *args):  # type: ignore[override]
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, *args)
+        finally:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - started, operation=_operation(sql))
+
+    def executemany(self, sql: str, *args):  # type: ignore[override]
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, *args)
+        finally:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - started, operation=_operation(sql))
+
+
+def _operation(sql: str) -> str:
+    return sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ""
+
+
+HTTP_REQUESTS = Counter(
+    "yeabook_http_requests_total",
+    "HTTP requests by endpoint, method and status code.",
+    ("endpoint", "method", "status"),
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "yeabook_http_request_duration_seconds",
+    "Time spent handling HTTP requests.",
+    ("endpoint",),
+)
+PUBLISH_SECONDS = Histogram(
+    "yeabook_publish_duration_seconds",
+    "Time taken to publish the phonebook XML.",
+    ("mode",),
+)
+PUBLISH_BYTES = Histogram(
+    "yeabook_publish_size_bytes",
+    "Size of the published phonebook XML.",
+    buckets=SIZE_BUCKETS,
+)
+DB_QUERY_SECONDS = Histogram(
+    "yeabook_db_query_duration_seconds",
+    "Time SQLite spent executing statements, by statement type.",
+    ("operation",),
+)
+CONTACT_SUMMARY_SECONDS = Histogram(
+    "yeabook_contact_summary_build_seconds",
+    "Time taken to rebuild the per-generation contact summary.",
+)
+STATUS_FETCHES = Counter(
+    "yeabook_release_status_fetches_total",
+    "Release status lookups by source and outcome.",
+    ("source", "outcome"),
+)
+REPLICA_SYNCS = Counter(
+    "yeabook_replica_syncs_total",
+    "Replica polls of the primary feed by outcome.",
+    ("outcome",),
+)
@@ -0,0 +1,34 @@
+import re
+from typing import Optional, Set
+
+NUMBER_FIELDS = ("telephone", "mobile", "other")
+
+_NON_DIGITS = re.compile(r"\D")
+
+
+def number_digits(value: Optional[str]) -> str:
+    return _NON_DIGITS.sub("", value or "")
+
+
+def number_variants(value: Optional[str], country_code: str = "") -> Set[str]:
+    # Digit strings a number can be presented as: the digits as stored plus
+    # its international form (E.164 without "+") and, when the local country
+    # code is known, the national trunk-prefixed form.
+    raw = (value or "").strip()
+    digits = number_digits(raw)
+    if not digits:
+        return set()
+    variants = {digits}
+    if raw.startswith("+"):
+        international = digits
+    elif digits.startswith("00"):
+        international = digits[2:]
+    elif country_code and digits.startswith("0"):
+        international = country_code + digits[1:]
+    else:
+        international = ""
+    if international:
+        variants.add(international)
+        if country_code and international.startswith(country_code):
+            variants.add("0" + international[len(country_code):])
+    return variants
@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+
+from .cache import LRUCache
+from .feed import FeedSnapshot, build_feed_snapshot
+from .xml_utils import (
+    XML_FOOTER,
+    iter_phonebook_xml,
+    render_header,
+    render_link_menu,
+    write_atomic,
+    write_chunks,
+)
+
+
+# (group name, offset, count, group size): a run of one group's rows on a page
+PageSlice = Tuple[str, int, int, int]
+PageLayout = Tuple[PageSlice, ...]
+# (group name, offset, count) -> that run of the group's rows in phonebook
+# order; group sizes are given in phonebook order as well.
+GroupRows = Callable[[str, int, int], Iterable[Mapping]]
+
+
+@dataclass
+class PageSet:
+    # What was last written, so the next publish can skip unchanged pages
+    page_size: int
+    layouts: List[PageLayout] = field(default_factory=list)
+    labels: List[str] = field(default_factory=list)
+
+
+def pages_dir(xml_path: Path) -> Path:
+    return xml_path.with_name(xml_path.stem + "-pages")
+
+
+def page_path(xml_path: Path, number: int) -> Path:
+    return pages_dir(xml_path) / f"{number}.xml"
+
+
+def manifest_path(xml_path: Path) -> Path:
+    return pages_dir(xml_path) / "index.json"
+
+
+def plan_pages(group_sizes: Iterable[Tuple[str, int]], page_size: int) -> List[PageLayout]:
+    # Fills pages with whole groups; only a group that does not fit on an
+    # empty page is cut, alphabetically by name.
+    layouts: List[PageLayout] = []
+    page: List[PageSlice] = []
+    units = 0
+    for group_name, size in group_sizes:
+        if units and units + size > page_size:
+            layouts.append(tuple(page))
+            page, units = [], 0
+        offset = 0
+        while size - offset > page_size - units:
+            take = page_size - units
+            page.append((group_name, offset, take, size))
+            offset += take
+            layouts.append(tuple(page))
+            page, units = [], 0
+        if size > offset:
+            page.append((group_name, offset, size - offset, size))
+            units += size - offset
+    if page:
+        layouts.append(tuple(page))
+    return layouts
+
+
+def page_label(menus: List[Tuple[str, List[Mapping]]], partial: Sequence[bool]) -> str:
+    # Groups cut by the page break carry the name range they hold here,
+    # e.g. "Sales (Ma–Mo) – Support"; partial[i] is True for cut menus[i].
+    first = _menu_label(*menus[0], partial[0])
+    if len(menus) == 1:
+        return first
+    return f"{first} – {_menu_label(*menus[-1], partial[-1])}"
+
+
+def _menu_label(group_name: str, rows: List[Mapping], partial: bool) -> str:
+    if not partial:
+        return group_name
+    first, last = _name_prefixes(
+        (rows[0]["name"] or "").strip(),
+        (rows[-1]["name"] or "").strip(),
+    )
+    return f"{group_name} ({first}–{last})"
+
+
+def _name_prefixes(first: str, last: str) -> Tuple[str, str]:
+    # Shortest prefixes, at least two characters, that tell the names apart
+    length = 2
+    while length < max(len(first), len(last)) and (
+        first[:length].casefold() == last[:length].casefold()
+    ):
+        length += 1
+    return first[:length], last[:length]
+
+
+def write_pages(
+    group_sizes: Iterable[Tuple[str, int]],
+    group_rows: GroupRows,
+    xml_path: Path,
+    *,
+    page_size: int,
+    title: str,
+    prompt: str,
+    fsync: bool = False,
+) -> PageSet:
+    # Renders every page; files whose bytes did not change are left alone,
+    # so handsets browsing them keep getting 304s after an unrelated edit.
+    # Pages are planned from the sizes alone and only one page's rows are
+    # held at a time.
+    return _write_layouts(
+        PageSet(page_size),
+        plan_pages(group_sizes, page_size),
+        None,
+        group_rows,
+        xml_path,
+        title=title,
+        prompt=prompt,
+        fsync=fsync,
+    )
+
+
+def update_pages(
+    previous: PageSet,
+    group_sizes: Iterable[Tuple[str, int]],
+    changed_groups: Set[str],
+    group_rows: GroupRows,
+    xml_path: Path,
+    *,
+    title: str,
+    prompt: str,
+    fsync: bool = False,
+) -> PageSet:
+    # Re-renders only the pages that hold a changed group or whose cut moved
+    layouts = plan_pages(group_sizes, previous.page_size)
+    return _write_layouts(
+        previous,
+        layouts,
+        changed_groups,
+        group_rows,
+        xml_path,
+        title=title,
+        prompt=prompt,
+        fsync=fsync,
+    )
+
+
+def _write_layouts(
+    previous: PageSet,
+    layouts: List[PageLayout],
+    changed_groups: Optional[Set[str]],
+    group_rows: GroupRows,
+    xml_path: Path,
+    *,
+    title: str,
+    prompt: str,
+    fsync: bool,
+) -> PageSet:
+    # changed_groups=None renders every page
+    directory = pages_dir(xml_path)
+    directory.mkdir(parents=True, exist_ok=True)
+    labels: List[str] = []
+    for index, layout in enumerate(layouts):
+        if (
+            changed_groups is not None
+            and index < len(previous.layouts)
+            and previous.layouts[index] == layout
+            and not any(page_slice[0] in changed_groups for page_slice in layout)
+        ):
+            labels.append(previous.labels[index])
+            continue
+        menus = [
+            (group_name, list(group_rows(group_name, offset, count)))
+            for group_name, offset, count, _ in layout
+        ]
+        labels.append(page_label(menus, [count != size for _, _, count, size in layout]))
+        body = b"".join(iter_phonebook_xml(menus, title=title, prompt=prompt))
+        target = page_path(xml_path, index + 1)
+        try:
+            unchanged = target.read_bytes() == body
+        except FileNotFoundError:
+            unchanged = False
+        if not unchanged:
+            write_chunks([body], target, fsync=fsync)
+    if changed_groups is None or labels != previous.labels:
+        _write_manifest(manifest_path(xml_path), labels)
+    if changed_groups is None or len(labels) < len(previous.labels):
+        _remove_stale_pages(xml_path, len(labels))
+    return PageSet(previous.page_size, layouts, labels)
+
+
+def _write_manifest(path: Path, labels: List[str]) -> None:
+    write_atomic(path, json.dumps({"pages": labels}).encode("utf-8"))
+
+
+def _remove_stale_pages(xml_path: Path, count: int) -> None:
+    for path in pages_dir(xml_path).glob("*.xml*"):
+        number = path.name.partition(".")[0]
+        if number.isdigit() and int(number) > count:
+            path.unlink(missing_ok=True)
+
+
+def render_page_index(labels: List[str], urls: List[str], *, title: str, prompt: str) -> bytes:
+    menus = b"".join(render_link_menu(label, url) for label, url in zip(labels, urls))
+    return render_header(title=title, prompt=prompt) + menus + XML_FOOTER
+
+
+def get_page_index(
+    xml_path: Path,
+    host_url: str,
+    page_url: Callable[[int], str],
+    *,
+    cache: LRUCache,
+    generation: int,
+    title: str,
+    prompt: str,
+) -> Optional[FeedSnapshot]:
+    # Handsets need absolute links, so the index is cached per host it was
+    # requested under; `cache` belongs to the tenant and `generation` is the
+    # published book's, and the manifest's stat catches a republish of it.
+    path = manifest_path(xml_path)
+    try:
+        stat_result = path.stat()
+    except FileNotFoundError:
+        return None
+    stat_key = (stat_result.st_ino, stat_result.st_mtime_ns, stat_result.st_size)
+    cached = cache.get(host_url, generation)
+    if cached is not None and cached[0] == stat_key:
+        return cached[1]
+    try:
+        labels = json.loads(path.read_text(encoding="utf-8"))["pages"]
+    except (FileNotFoundError, ValueError, KeyError):
+        return None
+    if len(labels) < 2:
+        return None
+    urls = [page_url(number) for number in range(1, len(labels) + 1)]
+    body = render_page_index(labels, urls, title=title, prompt=prompt)
+    snapshot = build_feed_snapshot(body, generation)
+    cache.put(host_url, (stat_key, snapshot), generation)
+    return snapshot
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import os
+import queue
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Iterable, List, Type
+
+
+# Keeps up to `size` idle connections per process so requests reuse an open
+# database and its prepared-statement cache. Demand beyond `size` gets an
+# extra connection that is closed on release instead of blocking.
+class ConnectionPool:
+    def __init__(
+        self,
+        database: Path,
+        *,
+        size: int,
+        pragmas: Iterable[str],
+        cached_statements: int = 128,
+        factory: Type[sqlite3.Connection] = sqlite3.Connection,
+    ) -> None:
+        self.database = database
+        self.size = max(size, 0)
+        self._pragmas: List[str] = list(pragmas)
+        self._cached_statements = cached_statements
+        self._factory = factory
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def acquire(self) -> sqlite3.Connection:
+        self._check_fork()
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if self._is_healthy(conn):
+                return conn
+            self._close(conn)
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        if self._check_fork():
+            # Borrowed before a fork; it belongs to the parent process.
+            return
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._close(conn)
+            return
+        if self._idle.qsize() >= self.size:
+            self._close(conn)
+            return
+        self._idle.put(conn)
+
+    def close_all(self) -> None:
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(conn)
+
+    def _connect(self) -> sqlite3.Connection:
+        self.database.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(
+            self.database,
+            cached_statements=self._cached_statements,
+            factory=self._factory,
+            # A pooled connection may be returned by one thread and borrowed by
+            # another; it is never used by two threads at the same time.
+            check_same_thread=False,
+        )
+        conn.row_factory = sqlite3.Row
+        for statement in self._pragmas:
+            conn.execute(statement)
+        return conn
+
+    @staticmethod
+    def _is_healthy(conn: sqlite3.Connection) -> bool:
+        try:
+            conn.execute("SELECT 1").fetchone()
+        except sqlite3.Error:
+            return False
+        return True
+
+    @staticmethod
+    def _close(conn: sqlite3.Connection) -> None:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def _check_fork(self) -> bool:
+        # SQLite connections must not cross a fork (gunicorn --preload); a
+        # child starts with an empty pool and leaves the parent's handles alone.
+        pid = os.getpid()
+        if pid == self._pid:
+            return False
+        with self._lock:
+            if pid != self._pid:
+                self._idle = queue.LifoQueue()
+                self._pid = pid
+        return True
@@ -0,0 +1,332 @@
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Set
+
+from flask import Flask, g
+
+from .db import (
+    compact_change_journal,
+    fetch_generation,
+    iter_phonebook_group_rows,
+    iter_phonebook_rows,
+    phonebook_group,
+    phonebook_group_sort_key,
+)
+from .feed import refresh_feed_snapshot
+from .locking import file_lock
+from .metrics import PUBLISH_BYTES, PUBLISH_SECONDS
+from .paging import PageSet, update_pages, write_pages
+from .tenants import Tenant, tenant_config
+from .xml_utils import (
+    XML_FOOTER,
+    group_ordered_rows,
+    render_header,
+    render_menu,
+    write_atomic,
+    write_chunks,
+)
+
+
+@dataclass
+class _RenderedBook:
+    generation: int
+    header: bytes
+    # Effective group name -> encoded <Menu> element
+    fragments: Dict[str, bytes]
+    # Effective group name -> number of contacts
+    sizes: Dict[str, int]
+    pages: Optional[PageSet] = None
+
+
+# Keeps one serialized <Menu> per group so single edits only re-render the
+# groups they touched; anything unexpected falls back to a full rebuild.
+class PhonebookPublisher:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._book: Optional[_RenderedBook] = None
+        self._pending_groups: Set[str] = set()
+        self._pending_mutations = 0
+
+    def mark_changed(self, *group_names: Optional[str]) -> None:
+        # Call once per committed single-row mutation with the group(s) the
+        # row was in before and after the change.
+        default_group = tenant_config()["DEFAULT_GROUP_NAME"]
+        with self._lock:
+            self._pending_mutations += 1
+            self._pending_groups.update(
+                phonebook_group(group_name, default_group) for group_name in group_names
+            )
+
+    def publish(self, *, full: bool = False) -> int:
+        config = tenant_config()
+        xml_path = Path(config["XML_FILE"])
+        default_group = config["DEFAULT_GROUP_NAME"]
+        header = render_header(title=config["PHONEBOOK_TITLE"], prompt=config["PHONEBOOK_PROMPT"])
+        with self._lock:
+            started = time.perf_counter()
+            mode = "incremental"
+            generation = fetch_generation()
+            book = self._book
+            changed_groups = set(self._pending_groups)
+            changed_rows: Dict[str, List[Mapping]] = {}
+            if full or book is None or not self._is_consistent(book, header, generation, xml_path):
+                mode = "full"
+                book = self._render_full(header, generation, default_group)
+            else:
+                changed_rows = self._render_groups(book, changed_groups, default_group)
+                book.generation = generation
+            self._book = book
+            self._pending_groups.clear()
+            self._pending_mutations = 0
+            size = write_chunks(self._assemble(book), xml_path, fsync=config["PUBLISH_FSYNC"])
+            if config["PHONEBOOK_PAGE_SIZE"] > 0:
+                self._publish_pages(book, mode, changed_groups, changed_rows, config, xml_path)
+            _write_source(xml_path, _publish_source(config, generation))
+            PUBLISH_SECONDS.observe(time.perf_counter() - started, mode=mode)
+            PUBLISH_BYTES.observe(size)
+        refresh_feed_snapshot(xml_path)
+        return size
+
+    def is_current(self) -> bool:
+        # True when the XML on disk was built from the current contacts with
+        # the current settings, e.g. by another worker or a previous run.
+        config = tenant_config()
+        xml_path = Path(config["XML_FILE"])
+        return xml_path.exists() and _read_source(xml_path) == _publish_source(
+            config, fetch_generation()
+        )
+
+    def _is_consistent(
+        self,
+        book: _RenderedBook,
+        header: bytes,
+        generation: int,
+        xml_path: Path,
+    ) -> bool:
+        # Every local mutation bumps the generation exactly once; any other
+        # difference means a change this process has not seen (for example
+        # from another worker), so the cached fragments cannot be trusted.
+        return (
+            book.header == header
+            and generation == book.generation + self._pending_mutations
+            and xml_path.exists()
+        )
+
+    @staticmethod
+    def _render_full(header: bytes, generation: int, default_group: str) -> _RenderedBook:
+        fragments: Dict[str, bytes] = {}
+        sizes: Dict[str, int] = {}
+        for group_name, rows in group_ordered_rows(iter_phonebook_rows(default_group)):
+            entries = list(rows)
+            fragments[group_name] = render_menu(group_name, entries)
+            sizes[group_name] = len(entries)
+        return _RenderedBook(generation=generation, header=header, fragments=fragments, sizes=sizes)
+
+    @staticmethod
+    def _render_groups(
+        book: _RenderedBook,
+        group_names: Iterable[str],
+        default_group: str,
+    ) -> Dict[str, List[Mapping]]:
+        # Returns the rows it fetched so the pages can reuse them
+        fetched: Dict[str, List[Mapping]] = {}
+        for group_name in group_names:
+            rows = iter_phonebook_group_rows(group_name, default_group).fetchall()
+            fetched[group_name] = rows
+            if rows:
+                book.fragments[group_name] = render_menu(group_name, rows)
+                book.sizes[group_name] = len(rows)
+            else:
+                book.fragments.pop(group_name, None)
+                book.sizes.pop(group_name, None)
+        return fetched
+
+    @staticmethod
+    def _publish_pages(
+        book: _RenderedBook,
+        mode: str,
+        changed_groups: Set[str],
+        changed_rows: Dict[str, List[Mapping]],
+        config: Mapping[str, Any],
+        xml_path: Path,
+    ) -> None:
+        default_group = config["DEFAULT_GROUP_NAME"]
+
+        def group_rows(group_name: str, offset: int, count: int) -> Sequence[Mapping]:
+            if group_name in changed_rows:
+                return changed_rows[group_name][offset:offset + count]
+            return iter_phonebook_group_rows(
+                group_name, default_group, offset=offset, limit=count
+            ).fetchall()
+
+        group_sizes = [
+            (group_name, book.sizes[group_name])
+            for group_name in sorted(book.sizes, key=phonebook_group_sort_key)
+        ]
+        if mode == "full" or book.pages is None:
+            book.pages = write_pages(
+                group_sizes,
+                group_rows,
+                xml_path,
+                page_size=config["PHONEBOOK_PAGE_SIZE"],
+                title=config["PHONEBOOK_TITLE"],
+                prompt=config["PHONEBOOK_PROMPT"],
+                fsync=config["PUBLISH_FSYNC"],
+            )
+            return
+        book.pages = update_pages(
+            book.pages,
+            group_sizes,
+            changed_groups,
+            group_rows,
+            xml_path,
+            title=config["PHONEBOOK_TITLE"],
+            prompt=config["PHONEBOOK_PROMPT"],
+            fsync=config["PUBLISH_FSYNC"],
+        )
+
+    @staticmethod
+    def _assemble(book: _RenderedBook) -> Iterator[bytes]:
+        yield book.header
+        for group_name in sorted(book.fragments, key=phonebook_group_sort_key):
+            yield book.fragments[group_name]
+        yield XML_FOOTER
+
+
+def _source_path(xml_path: Path) -> Path:
+    return xml_path.with_name(xml_path.name + ".source")
+
+
+def _publish_source(config: Mapping[str, Any], generation: int) -> Dict[str, Any]:
+    # Everything the published files depend on
+    return {
+        "generation": generation,
+        "app_version": config["APP_VERSION"],
+        "title": config["PHONEBOOK_TITLE"],
+        "prompt": config["PHONEBOOK_PROMPT"],
+        "default_group": config["DEFAULT_GROUP_NAME"],
+        "page_size": config["PHONEBOOK_PAGE_SIZE"],
+    }
+
+
+def _read_source(xml_path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads(_source_path(xml_path).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _write_source(xml_path: Path, source: Dict[str, Any]) -> None:
+    # Written after the XML and pages, so a crash in between leaves an older
+    # stamp and the next start publishes again.
+    write_atomic(_source_path(xml_path), json.dumps(source).encode("utf-8"))
+
+
+# Coalesces bursts of edits: mutations mark the book dirty and a background
+# thread publishes once per debounce window. A window of 0 publishes inline.
+class PublishScheduler:
+    def __init__(
+        self,
+        app: Flask,
+        publisher: PhonebookPublisher,
+        *,
+        debounce: float,
+        tenant: Tenant,
+    ) -> None:
+        self._app = app
+        self._publisher = publisher
+        self._debounce = debounce
+        self._tenant = tenant
+        self._lock_path = Path(tenant.config["XML_FILE"] + ".lock")
+        self._condition = threading.Condition()
+        self._dirty = False
+        self._closed = False
+        self._deadline = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._thread_pid: Optional[int] = None
+        atexit.register(self.flush)
+
+    def request_publish(self) -> None:
+        if self._debounce <= 0 or self._closed:
+            self._publish()
+            return
+        with self._condition:
+            if not self._dirty:
+                # The window opens with the first edit and is not extended by
+                # later ones, so a steady stream of edits still gets published.
+                self._dirty = True
+                self._deadline = time.monotonic() + self._debounce
+            self._ensure_worker()
+            self._condition.notify()
+
+    def flush(self, *, force: bool = False) -> None:
+        with self._condition:
+            if not (self._dirty or force):
+                return
+            self._dirty = False
+        self._publish()
+
+    def publish_if_stale(self) -> bool:
+        # Startup path: skips the publish when whoever held the lock before us
+        # (another worker, the master with --preload, or the previous run)
+        # already published this generation.
+        with self._app.app_context(), file_lock(self._lock_path):
+            g.tenant = self._tenant
+            if self._publisher.is_current():
+                return False
+            self._publisher.publish()
+            compact_change_journal(retention=self._tenant.config["CHANGES_RETENTION"])
+        return True
+
+    def close(self) -> None:
+        # Publishes what is pending and stops the worker thread; later edits
+        # (from requests still holding the tenant) publish inline.
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        atexit.unregister(self.flush)
+        self.flush()
+
+    def _ensure_worker(self) -> None:
+        # Threads do not survive a fork, so a scheduler created in the gunicorn
+        # master (--preload) starts its own thread in each worker.
+        pid = os.getpid()
+        if self._thread is not None and self._thread_pid == pid and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(
+            target=self._run,
+            name="phonebook-publisher",
+            daemon=True,
+        )
+        self._thread_pid = pid
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not (self._dirty or self._closed):
+                    self._condition.wait()
+                if self._closed:
+                    return
+                delay = self._deadline - time.monotonic()
+                if delay > 0:
+                    self._condition.wait(delay)
+                    continue
+                self._dirty = False
+            try:
+                self._publish()
+            except Exception:  # keep the worker alive for the next edit
+                self._app.logger.exception("Background phonebook publish failed")
+
+    def _publish(self) -> None:
+        with self._app.app_context(), file_lock(self._lock_path):
+            g.tenant = self._tenant
+            self._publisher.publish()
+            compact_change_journal(retention=self._tenant.config["CHANGES_RETENTION"])
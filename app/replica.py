@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from .locking import file_lock
+from .metrics import REPLICA_SYNCS
+from .paging import write_pages
+from .xml_utils import (
+    group_ordered_rows,
+    parse_phonebook_rows,
+    read_generation,
+    write_atomic,
+    write_chunks,
+)
+
+
+# Everything a sync needs, captured from the app config so it can run on a
+# background thread without an application context.
+@dataclass(frozen=True)
+class ReplicaSource:
+    feed_url: str
+    xml_path: Path
+    state_path: Path
+    interval: float
+    timeout: float
+    fsync: bool
+    # Pages are cut locally so their links point at this node
+    page_size: int
+    title: str
+    prompt: str
+
+
+def feed_url(primary: str) -> str:
+    # The full document even when the primary serves a page index
+    return f"{primary.rstrip('/')}/phonebook.xml?full=1"
+
+
+def _empty_state() -> Dict[str, Any]:
+    return {
+        "etag": None,
+        "last_attempt": 0.0,
+        "last_sync": 0.0,
+        "last_change": 0.0,
+        "primary_generation": None,
+        "page_size": 0,
+        "error": None,
+    }
+
+
+def read_replica_state(path: Path) -> Dict[str, Any]:
+    try:
+        return {**_empty_state(), **json.loads(path.read_text(encoding="utf-8"))}
+    except (FileNotFoundError, ValueError):
+        return _empty_state()
+
+
+def _write_state(path: Path, state: Dict[str, Any]) -> None:
+    write_atomic(path, json.dumps(state).encode("utf-8"))
+
+
+def _fetch_feed(
+    url: str,
+    timeout: float,
+    etag: Optional[str],
+) -> Optional[Tuple[bytes, Optional[str], Optional[int]]]:
+    # Returns (xml, etag, primary generation), or None when the primary
+    # answered 304. The body travels gzip-compressed over the WAN; the local
+    # sidecars are rebuilt when the XML is written.
+    headers = {"Accept-Encoding": "gzip", "User-Agent": "YeaBook-replica/1.0"}
+    if etag:
+        headers["If-None-Match"] = etag
+    request = urllib.request.Request(url, headers=headers)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:  # type: ignore[call-arg]
+            body = response.read()
+            if response.headers.get("Content-Encoding") == "gzip":
+                body = gzip.decompress(body)
+            generation = response.headers.get("X-Phonebook-Generation")
+            return (
+                body,
+                response.headers.get("ETag"),
+                int(generation) if generation and generation.isdigit() else None,
+            )
+    except urllib.error.HTTPError as error:
+        if error.code == 304:
+            return None
+        raise
+
+
+def sync_replica(source: ReplicaSource, *, force: bool = False) -> Dict[str, Any]:
+    # Workers queue up on the lock; whoever comes second finds a fresh
+    # attempt in the shared state and skips the request to the primary.
+    with file_lock(source.state_path.with_name(source.state_path.name + ".lock")):
+        state = read_replica_state(source.state_path)
+        now = time.time()
+        if not force and now - float(state["last_attempt"]) < source.interval / 2:
+            return state
+        state["last_attempt"] = now
+        # Without a local copy cut the same way, ask for the whole book again
+        current = source.xml_path.exists() and state["page_size"] == source.page_size
+        etag = state["etag"] if current else None
+        try:
+            result = _fetch_feed(source.feed_url, source.timeout, etag)
+            if result is not None:
+                # Before anything is written: a primary too old to honour
+                # ?full=1 answers with a page index, which is refused here.
+                rows = list(parse_phonebook_rows(result[0]))
+        except (urllib.error.URLError, TimeoutError, OSError, EOFError, ValueError) as error:
+            state["error"] = str(error) or error.__class__.__name__
+            outcome = "error"
+        else:
+            if result is None:
+                outcome = "not_modified"
+            else:
+                body, state["etag"], state["primary_generation"] = result
+                write_chunks(
+                    [body],
+                    source.xml_path,
+                    fsync=source.fsync,
+                    generation=state["primary_generation"],
+                )
+                if source.page_size > 0:
+                    # The fetched body is in memory already; page from its rows
+                    groups = {
+                        group_name: list(group_rows)
+                        for group_name, group_rows in group_ordered_rows(rows)
+                    }
+                    write_pages(
+                        [(group_name, len(entries)) for group_name, entries in groups.items()],
+                        lambda group_name, offset, count: groups[group_name][
+                            offset:offset + count
+                        ],
+                        source.xml_path,
+                        page_size=source.page_size,
+                        title=source.title,
+                        prompt=source.prompt,
+                        fsync=source.fsync,
+                    )
+                state["page_size"] = source.page_size
+                state["last_change"] = now
+                outcome = "updated"
+            state["last_sync"] = now
+            state["error"] = None
+        _write_state(source.state_path, state)
+    REPLICA_SYNCS.inc(outcome=outcome)
+    return state
+
+
+def replica_status(source: ReplicaSource, primary: str) -> Dict[str, Any]:
+    state = read_replica_state(source.state_path)
+    now = time.time()
+    last_sync = float(state["last_sync"])
+    return {
+        "primary": primary,
+        "last_sync": _isoformat(last_sync),
+        "last_attempt": _isoformat(float(state["last_attempt"])),
+        "last_change": _isoformat(float(state["last_change"])),
+        # Seconds since the primary last confirmed our copy; None before that
+        "lag_seconds": round(now - last_sync, 3) if last_sync else None,
+        "generation": read_generation(source.xml_path) if source.xml_path.exists() else None,
+        "primary_generation": state["primary_generation"],
+        "error": state["error"],
+    }
+
+
+def _isoformat(timestamp: float) -> Optional[str]:
+    if not timestamp:
+        return None
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat(timespec="seconds")
+
+
+# Polls the primary every `interval` seconds on a daemon thread; like the
+# publish scheduler, each gunicorn worker starts its own after the fork.
+class ReplicaSync:
+    def __init__(self, source: ReplicaSource, logger: logging.Logger) -> None:
+        self.source = source
+        self._logger = logger
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_pid: Optional[int] = None
+
+    def ensure_running(self) -> None:
+        pid = os.getpid()
+        if self._thread is not None and self._thread_pid == pid and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread_pid == pid and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="replica-sync", daemon=True)
+            self._thread_pid = pid
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                sync_replica(self.source)
+            except Exception:  # keep polling; the next round may succeed
+                self._logger.exception("Replica sync failed")
+            time.sleep(self.source.interval)
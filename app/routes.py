@@ -1,32 +1,95 @@
+import base64
+import csv
+import json
+import os
 import re
+import time
 from pathlib import Path
-from typing import Dict, List, Mapping, Optional
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
 
 from flask import (
     Blueprint,
+    Flask,
     Response,
+    abort,
     current_app,
     flash,
+    g,
     jsonify,
     redirect,
     render_template,
     request,
     session,
+    stream_with_context,
     url_for,
 )
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
 
+from .cache import LRUCache
 from .db import (
+    ChangeEntry,
+    ContactChange,
+    ContactSummary,
+    PageKey,
+    apply_contact_changes,
     close_db,
+    count_contacts,
     delete_contact,
+    fetch_changes,
     fetch_contact,
-    fetch_contacts,
+    fetch_contact_page,
+    fetch_contact_summary,
+    fetch_generation,
+    fetch_number_matches,
+    fetch_pragma_values,
     init_db,
     insert_contact,
+    insert_contacts,
+    iter_contact_snapshot,
+    iter_contacts,
+    iter_phonebook_group_rows,
+    phonebook_group_sort_key,
     update_contact,
 )
-from .i18n import get_language_options, get_message, get_ui_strings, resolve_language
+from .feed import (
+    FeedSnapshot,
+    build_feed_snapshot,
+    get_feed_snapshot,
+    negotiate_encoding,
+    set_snapshot_budget,
+)
+from .i18n import (
+    get_language_options,
+    get_message,
+    get_ui_markup,
+    get_ui_strings,
+    resolve_language,
+)
+from .locking import file_lock
+from .metrics import (
+    CONTACT_SUMMARY_SECONDS,
+    HTTP_REQUEST_SECONDS,
+    HTTP_REQUESTS,
+    MultiprocessExporter,
+    collect_local,
+    render_text,
+)
+from .paging import get_page_index, page_path
+from .publisher import PhonebookPublisher, PublishScheduler
+from .replica import ReplicaSource, ReplicaSync, replica_status
+from .replica import feed_url as replica_feed_url
 from .status import compare_versions, get_release_status
-from .xml_utils import write_phonebook_xml
+from .tenants import Tenant, TenantRegistry, current_tenant, tenant_config
+from .transfer import (
+    ImportRecord,
+    is_vcard_upload,
+    iter_csv_export,
+    iter_csv_records,
+    iter_vcard_export,
+    iter_vcard_records,
+)
+from .xml_utils import iter_phonebook_xml
 
 bp = Blueprint("main", __name__)
 
@@ -36,42 +99,233 @@ PHONE_LABEL_KEYS: Dict[str, str] = {
     "mobile": "form_mobile_label",
     "other": "form_other_label",
 }
+CONTACT_FIELDS = ("name", "telephone", "mobile", "other", "group_name")
+STATIC_FRAGMENTS = ("help", "header_controls", "transfer", "table_head")
+# Endpoints a replica serves itself, under either blueprint name
+REPLICA_ENDPOINTS = frozenset(
+    {
+        "phonebook",
+        "phonebook_page",
+        "replica_api",
+        "status_api",
+        "metrics",
+    }
+)
 
 
-def _publish_phonebook() -> str:
-    contacts = fetch_contacts()
-    xml_path = Path(current_app.config["XML_FILE"])
-    title = current_app.config["PHONEBOOK_TITLE"]
-    prompt = current_app.config["PHONEBOOK_PROMPT"]
-    default_group = current_app.config["DEFAULT_GROUP_NAME"]
-    return write_phonebook_xml(
-        contacts,
-        xml_path,
-        title=title,
-        prompt=prompt,
-        default_group=default_group,
-    )
+def _publisher() -> PhonebookPublisher:
+    return current_tenant().extensions["phonebook_publisher"]
+
+
+def _scheduler() -> PublishScheduler:
+    return current_tenant().extensions["phonebook_scheduler"]
+
+
+def _lookup_cache() -> LRUCache:
+    return current_tenant().extensions["lookup_cache"]
+
+
+def _feed_cache() -> LRUCache:
+    return current_tenant().extensions["feed_cache"]
+
+
+def _fragment_cache() -> LRUCache:
+    return current_tenant().extensions["fragment_cache"]
+
+
+def _contact_summary() -> ContactSummary:
+    generation = fetch_generation()
+    cache = current_tenant().extensions["summary_cache"]
+    summary = cache.get("summary", generation)
+    if summary is None:
+        summary = fetch_contact_summary(tenant_config()["DEFAULT_GROUP_NAME"])
+        CONTACT_SUMMARY_SECONDS.observe(summary.build_seconds)
+        cache.put("summary", summary, generation)
+    return summary
+
+
+def _publish_phonebook(*changed_groups: Optional[str]) -> None:
+    # changed_groups: the group(s) a single committed mutation touched; when
+    # omitted the publisher decides between reassembly and a full rebuild.
+    if changed_groups:
+        _publisher().mark_changed(*changed_groups)
+    _scheduler().request_publish()
 
 
 @bp.record_once
 def _setup(state) -> None:
     app = state.app
     app.teardown_appcontext(close_db)
-    with app.app_context():
-        init_db()
-        _publish_phonebook()
+    app.url_value_preprocessor(_pull_tenant)
+    app.url_defaults(_push_tenant)
+    set_snapshot_budget(app.config["FEED_CACHE_BYTES"])
+    if app.config["TEMPLATE_CACHE_DIR"]:
+        # Compiled templates survive restarts and are shared by all workers
+        template_cache = Path(app.config["TEMPLATE_CACHE_DIR"])
+        template_cache.mkdir(parents=True, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(str(template_cache))
+    if app.config["METRICS_DIR"]:
+        app.extensions["metrics_exporter"] = MultiprocessExporter(
+            Path(app.config["METRICS_DIR"]),
+            interval=app.config["METRICS_FLUSH_INTERVAL"],
+        )
+    if app.config["REPLICA_OF"]:
+        app.extensions["replica_sync"] = ReplicaSync(
+            ReplicaSource(
+                feed_url=replica_feed_url(app.config["REPLICA_OF"]),
+                xml_path=Path(app.config["XML_FILE"]),
+                state_path=Path(app.config["REPLICA_STATE_FILE"]),
+                interval=max(app.config["REPLICA_INTERVAL"], 1.0),
+                timeout=app.config["REPLICA_TIMEOUT"],
+                fsync=app.config["PUBLISH_FSYNC"],
+                page_size=app.config["PHONEBOOK_PAGE_SIZE"],
+                title=app.config["PHONEBOOK_TITLE"],
+                prompt=app.config["PHONEBOOK_PROMPT"],
+            ),
+            app.logger,
+        )
+        app.extensions["replica_sync"].ensure_running()
+    # The directory served without a /t/<tenant> prefix keeps its objects
+    # in app.extensions.
+    default_tenant = Tenant(name="", config=app.config, extensions=app.extensions)
+    app.extensions["default_tenant"] = default_tenant
+    app.extensions["tenant_registry"] = TenantRegistry(
+        Path(app.config["TENANTS_DIR"]),
+        app.config,
+        capacity=app.config["TENANT_CACHE_SIZE"],
+        open_tenant=lambda tenant: _open_tenant(app, tenant),
+        close_tenant=_close_tenant,
+    )
+    _open_tenant(app, default_tenant)
+
+
+def _open_tenant(app: Flask, tenant: Tenant) -> None:
+    config = tenant.config
+    publisher = PhonebookPublisher()
+    scheduler = PublishScheduler(
+        app,
+        publisher,
+        debounce=config["PUBLISH_DEBOUNCE"],
+        tenant=tenant,
+    )
+    tenant.extensions["phonebook_publisher"] = publisher
+    tenant.extensions["phonebook_scheduler"] = scheduler
+    tenant.extensions["lookup_cache"] = LRUCache(config["LOOKUP_CACHE_SIZE"])
+    tenant.extensions["feed_cache"] = LRUCache(config["FEED_CACHE_SIZE"])
+    tenant.extensions["fragment_cache"] = LRUCache(16)
+    tenant.extensions["summary_cache"] = LRUCache(1)
+    # One page index per host name the phones use; requests decide the host
+    tenant.extensions["page_index_cache"] = LRUCache(8)
+    # Every gunicorn worker runs this at import; the lock lets the first one
+    # migrate and publish while the others wait and find nothing left to do.
+    with file_lock(Path(config["DATABASE"] + ".startup.lock")):
+        with app.app_context():
+            g.tenant = tenant
+            init_db()
+        if not config["REPLICA_OF"]:
+            scheduler.publish_if_stale()
+
+
+def _close_tenant(tenant: Tenant) -> None:
+    tenant.extensions["phonebook_scheduler"].close()
+    pool = tenant.extensions.get("sqlite_pool")
+    if pool is not None:
+        pool.close_all()
+
+
+def _pull_tenant(endpoint: Optional[str], values: Optional[Dict]) -> None:
+    if not values or "tenant" not in values:
+        return
+    tenant = current_app.extensions["tenant_registry"].get(values.pop("tenant"))
+    if tenant is None:
+        abort(404)
+    g.tenant = tenant
+
+
+def _push_tenant(endpoint: str, values: Dict) -> None:
+    tenant = g.get("tenant")
+    if tenant is not None and tenant.name and "tenant" not in values:
+        if current_app.url_map.is_endpoint_expecting(endpoint, "tenant"):
+            values["tenant"] = tenant.name
+
+
+@bp.before_app_request
+def _start_request_timer() -> None:
+    g.request_started = time.perf_counter()
+
+
+@bp.before_app_request
+def _guard_replica():
+    # A replica only mirrors the primary's feed; everything backed by the
+    # local database is left to the primary.
+    replica = current_app.extensions.get("replica_sync")
+    if replica is None or request.blueprint is None:
+        return None
+    replica.ensure_running()
+    endpoint = (request.endpoint or "").rpartition(".")[2]
+    if endpoint in REPLICA_ENDPOINTS:
+        # Filtered feeds are rendered from the database
+        if endpoint != "phonebook" or not request.args.get("groups"):
+            return None
+    if endpoint == "index" and request.method == "GET":
+        return redirect(current_app.config["REPLICA_OF"].rstrip("/") + request.path)
+    return _api_error("read-only replica; use the primary", 403)
+
+
+@bp.after_app_request
+def _record_request_metrics(response: Response) -> Response:
+    started = g.pop("request_started", None)
+    if started is not None:
+        endpoint = request.endpoint or "unmatched"
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint)
+        HTTP_REQUESTS.inc(
+            endpoint=endpoint,
+            method=request.method,
+            status=str(response.status_code),
+        )
+        exporter = current_app.extensions.get("metrics_exporter")
+        if exporter is not None:
+            exporter.ensure_running()
+    return response
+
+
+@bp.route("/metrics", methods=["GET"])
+def metrics():
+    exporter: Optional[MultiprocessExporter] = current_app.extensions.get("metrics_exporter")
+    samples = exporter.collect() if exporter is not None else collect_local()
+    return Response(render_text(samples), mimetype="text/plain; version=0.0.4")
 
 
 @bp.route("/", methods=["GET"])
 def index():
     language = _get_language()
     ui_strings = get_ui_strings(language)
-    contacts = fetch_contacts()
-    default_group = current_app.config["DEFAULT_GROUP_NAME"]
-    groups = sorted(
-        {contact.get("group_name") or default_group for contact in contacts},
-        key=lambda value: value.casefold(),
+    default_group = tenant_config()["DEFAULT_GROUP_NAME"]
+    search = (request.args.get("q") or "").strip()
+    after = _decode_page_key(request.args.get("after"))
+    before = None if after else _decode_page_key(request.args.get("before"))
+    contacts, has_more = fetch_contact_page(
+        default_group,
+        limit=max(tenant_config()["CONTACTS_PAGE_SIZE"], 1),
+        search=search,
+        after=after,
+        before=before,
     )
+    if not contacts and (after or before):
+        # The cursor walked off either end (rows deleted meanwhile)
+        return redirect(url_for(".index", q=search or None))
+    has_previous = has_more if before else after is not None
+    has_next = True if before else has_more
+    summary = _contact_summary()
+    total_count = summary.total
+    match_count = count_contacts(search) if search else total_count
+    if search:
+        list_summary = get_message(
+            language, "search_summary", matches=match_count, total=total_count, query=search
+        )
+    else:
+        list_summary = get_message(language, "list_summary", shown=len(contacts), total=total_count)
+    groups = list(summary.group_names)
     if not groups:
         groups = [default_group]
     elif default_group not in groups:
@@ -89,8 +343,18 @@ def index():
     )
     return render_template(
         "index.html",
+        fragments=_static_fragments(language),
+        edit_url=_row_url(".index", "edit"),
+        delete_url=_row_url(".remove_contact", "contact_id"),
         contacts=contacts,
-        ui=ui_strings,
+        search=search,
+        total_count=total_count,
+        match_count=match_count,
+        list_summary=list_summary,
+        previous_cursor=_encode_page_key(contacts[0]) if has_previous and contacts else None,
+        next_cursor=_encode_page_key(contacts[-1]) if has_next and contacts else None,
+        ui=get_ui_markup(language),
+        ui_text=ui_strings,
         languages=get_language_options(),
         current_language=language,
         groups=groups,
@@ -98,11 +362,42 @@ def index():
         edit_contact=edit_contact,
         is_editing=edit_contact is not None,
         editing_notice=editing_notice,
-        app_version=current_app.config["APP_VERSION"],
-        status_endpoint=url_for("main.status_api"),
+        app_version=tenant_config()["APP_VERSION"],
+        status_endpoint=url_for(".status_api"),
     )
 
 
+def _static_fragments(language: str) -> Dict[str, Markup]:
+    # Parts of the page that depend only on the language and the host they
+    # link to are rendered once; the fragments never go stale, hence the
+    # fixed generation.
+    cache_key = (language, request.url_root)
+    fragments = _fragment_cache().get(cache_key, 0)
+    if fragments is None:
+        context = {
+            "ui": get_ui_markup(language),
+            "languages": get_language_options(),
+            "current_language": language,
+        }
+        fragments = {
+            name: Markup(render_template(f"fragments/{name}.html", **context))
+            for name in STATIC_FRAGMENTS
+        }
+        _fragment_cache().put(cache_key, fragments, 0)
+    return fragments
+
+
+def _row_url(endpoint: str, id_argument: str) -> Tuple[str, str]:
+    # url_for per table row dominated rendering the list; build the URL once
+    # and let the template put each row's id in between. Two URLs that differ
+    # only in the id differ in exactly that one character, so the split never
+    # depends on what else (host, tenant, other arguments) the URL contains.
+    first = url_for(endpoint, **{id_argument: 1})
+    second = url_for(endpoint, **{id_argument: 2})
+    start = len(os.path.commonprefix([first, second]))
+    return first[:start], first[start + 1:]
+
+
 @bp.route("/contacts", methods=["POST"])
 def create_contact():
     language = _get_language()
@@ -115,11 +410,11 @@ def create_contact():
     custom_group = (request.form.get("custom_group_name") or "").strip()
     group_name = custom_group if group_choice == "__custom__" else group_choice
     if not group_name:
-        group_name = current_app.config["DEFAULT_GROUP_NAME"]
+        group_name = tenant_config()["DEFAULT_GROUP_NAME"]
 
     if not name:
         flash(get_message(language, "contact_name_required"), "error")
-        return redirect(url_for("main.index"))
+        return redirect(url_for(".index"))
 
     invalid_labels = _invalid_phone_labels(
         {"telephone": telephone, "mobile": mobile, "other": other},
@@ -134,12 +429,12 @@ def create_contact():
             ),
             "error",
         )
-        return redirect(url_for("main.index"))
+        return redirect(url_for(".index"))
 
     insert_contact(name, telephone, mobile, other, group_name)
-    _publish_phonebook()
+    _publish_phonebook(group_name)
     flash(get_message(language, "contact_added", name=name), "success")
-    return redirect(url_for("main.index"))
+    return redirect(url_for(".index"))
 
 
 @bp.route("/contacts/<int:contact_id>/update", methods=["POST"])
@@ -149,7 +444,7 @@ def update_contact_route(contact_id: int):
     existing = fetch_contact(contact_id)
     if existing is None:
         flash(get_message(language, "contact_missing"), "error")
-        return redirect(url_for("main.index"))
+        return redirect(url_for(".index"))
 
     name = (request.form.get("name") or "").strip()
     telephone = (request.form.get("telephone") or "").strip()
@@ -159,11 +454,11 @@ def update_contact_route(contact_id: int):
     custom_group = (request.form.get("custom_group_name") or "").strip()
     group_name = custom_group if group_choice == "__custom__" else group_choice
     if not group_name:
-        group_name = current_app.config["DEFAULT_GROUP_NAME"]
+        group_name = tenant_config()["DEFAULT_GROUP_NAME"]
 
     if not name:
         flash(get_message(language, "contact_name_required"), "error")
-        return redirect(url_for("main.index", edit=contact_id))
+        return redirect(url_for(".index", edit=contact_id))
 
     invalid_labels = _invalid_phone_labels(
         {"telephone": telephone, "mobile": mobile, "other": other},
@@ -178,42 +473,460 @@ def update_contact_route(contact_id: int):
             ),
             "error",
         )
-        return redirect(url_for("main.index", edit=contact_id))
+        return redirect(url_for(".index", edit=contact_id))
 
     was_updated = update_contact(contact_id, name, telephone, mobile, other, group_name)
     if not was_updated:
         flash(get_message(language, "contact_missing"), "error")
-        return redirect(url_for("main.index"))
+        return redirect(url_for(".index"))
 
-    _publish_phonebook()
+    _publish_phonebook(existing["group_name"], group_name)
     flash(get_message(language, "contact_updated", name=name), "success")
-    return redirect(url_for("main.index"))
+    return redirect(url_for(".index"))
 
 
 @bp.route("/contacts/<int:contact_id>/delete", methods=["POST"])
 def remove_contact(contact_id: int):
     language = _get_language()
-    delete_contact(contact_id)
-    _publish_phonebook()
+    existing = fetch_contact(contact_id)
+    if existing is not None:
+        delete_contact(contact_id)
+        _publish_phonebook(existing["group_name"])
     flash(get_message(language, "contact_removed"), "success")
-    return redirect(url_for("main.index"))
+    return redirect(url_for(".index"))
+
+
+@bp.route("/contacts/import", methods=["POST"])
+def import_contacts():
+    language = _get_language()
+    ui_strings = get_ui_strings(language)
+    upload = request.files.get("file")
+    if upload is None or not upload.filename:
+        flash(get_message(language, "import_missing_file"), "error")
+        return redirect(url_for(".index"))
+
+    if is_vcard_upload(upload.filename, upload.mimetype):
+        records = iter_vcard_records(upload.stream)
+    else:
+        records = iter_csv_records(upload.stream)
+    default_group = tenant_config()["DEFAULT_GROUP_NAME"]
+    batch_size = max(tenant_config()["IMPORT_BATCH_SIZE"], 1)
+    batch: List[ImportRecord] = []
+    imported = 0
+    skipped = 0
+    try:
+        for record in records:
+            invalid_labels = _invalid_phone_labels(
+                {key: record[key] for key in PHONE_LABEL_KEYS},
+                ui_strings,
+            )
+            if not record["name"] or invalid_labels:
+                skipped += 1
+                continue
+            record["group_name"] = record["group_name"] or default_group
+            batch.append(record)
+            if len(batch) >= batch_size:
+                imported += insert_contacts(batch)
+                batch = []
+        if batch:
+            imported += insert_contacts(batch)
+    except (UnicodeDecodeError, csv.Error):
+        flash(get_message(language, "import_unreadable", count=imported), "error")
+    else:
+        flash(
+            get_message(language, "import_done", count=imported, skipped=skipped),
+            "success" if imported else "error",
+        )
+    if imported:
+        # Bulk changes make the incremental cache inconsistent on purpose,
+        # so this is a single full rebuild.
+        _publish_phonebook()
+    return redirect(url_for(".index"))
+
+
+@bp.route("/contacts/export", methods=["GET"])
+def export_contacts() -> Response:
+    if request.args.get("format", "csv").lower() in {"vcf", "vcard"}:
+        chunks = iter_vcard_export(iter_contacts())
+        content_type = "text/vcard; charset=utf-8"
+        filename = "yeabook.vcf"
+    else:
+        chunks = iter_csv_export(iter_contacts())
+        content_type = "text/csv; charset=utf-8"
+        filename = "yeabook.csv"
+    response = Response(stream_with_context(chunks), content_type=content_type)
+    response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
 
 
 @bp.route("/phonebook.xml", methods=["GET"])
 def phonebook() -> Response:
-    xml_path = Path(current_app.config["XML_FILE"])
-    if not xml_path.exists():
-        xml_content = _publish_phonebook()
-    else:
-        xml_content = xml_path.read_text(encoding="utf-8")
-    return Response(xml_content, content_type="application/xml; charset=utf-8")
+    requested = _requested_groups(request.args.getlist("groups"))
+    if requested:
+        return _filtered_feed_response(requested)
+    config = tenant_config()
+    xml_path = Path(config["XML_FILE"])
+    snapshot = get_feed_snapshot(xml_path)
+    if snapshot is None and not config["REPLICA_OF"]:
+        _scheduler().flush(force=True)
+        snapshot = get_feed_snapshot(xml_path)
+    if snapshot is None:
+        abort(503)
+    if config["PHONEBOOK_PAGE_SIZE"] > 0 and not request.args.get("full"):
+        # Books larger than one page are served as an index of linked pages;
+        # ?full=1 (used by replicas) still gets the whole document.
+        index = get_page_index(
+            xml_path,
+            request.host_url,
+            lambda number: url_for(".phonebook_page", number=number, _external=True),
+            cache=current_tenant().extensions["page_index_cache"],
+            generation=snapshot.generation,
+            title=config["PHONEBOOK_TITLE"],
+            prompt=config["PHONEBOOK_PROMPT"],
+        )
+        if index is not None:
+            snapshot = index
+    response = _feed_response(snapshot)
+    response.headers["X-Phonebook-Generation"] = str(snapshot.generation)
+    return response
+
+
+@bp.route("/phonebook/pages/<int:number>.xml", methods=["GET"])
+def phonebook_page(number: int) -> Response:
+    if tenant_config()["PHONEBOOK_PAGE_SIZE"] <= 0:
+        abort(404)
+    snapshot = get_feed_snapshot(page_path(Path(tenant_config()["XML_FILE"]), number))
+    if snapshot is None:
+        abort(404)
+    return _feed_response(snapshot)
+
+
+@bp.route("/phonebook/<group_name>.xml", methods=["GET"])
+def group_phonebook(group_name: str) -> Response:
+    return _filtered_feed_response((group_name,))
+
+
+def _requested_groups(values: Iterable[str]) -> Tuple[str, ...]:
+    # ?groups=Staff,Support and repeated ?groups= parameters both work
+    names = {name.strip() for value in values for name in value.split(",")}
+    names.discard("")
+    return tuple(sorted(names))
+
+
+def _filtered_feed_response(requested: Iterable[str]) -> Response:
+    snapshot = _filtered_feed(tuple(requested))
+    if snapshot is None:
+        abort(404)
+    return _feed_response(snapshot)
+
+
+def _filtered_feed(requested: Tuple[str, ...]) -> Optional[FeedSnapshot]:
+    # Rendered straight from the database and cached per group selection;
+    # the cache is keyed by the contacts generation, so any mutation in any
+    # worker invalidates every variant at once.
+    config = tenant_config()
+    default_group = config["DEFAULT_GROUP_NAME"]
+    generation = fetch_generation()
+    cache = _feed_cache()
+    snapshot = cache.get(requested, generation)
+    if snapshot is not None:
+        return snapshot
+    groups = _resolve_groups(requested, _contact_summary().group_names)
+    if not groups:
+        return None
+    chunks = iter_phonebook_xml(
+        ((group, iter_phonebook_group_rows(group, default_group)) for group in groups),
+        title=config["PHONEBOOK_TITLE"],
+        prompt=config["PHONEBOOK_PROMPT"],
+    )
+    snapshot = build_feed_snapshot(b"".join(chunks), generation)
+    cache.put(requested, snapshot, generation)
+    return snapshot
+
+
+def _resolve_groups(requested: Iterable[str], existing: Sequence[str]) -> List[str]:
+    # Exact names win; otherwise match case-insensitively so /phonebook/staff.xml
+    # finds "Staff". Unknown names are ignored.
+    folded: Dict[str, List[str]] = {}
+    for name in existing:
+        folded.setdefault(name.casefold(), []).append(name)
+    resolved = set()
+    for name in requested:
+        if name in existing:
+            resolved.add(name)
+        else:
+            resolved.update(folded.get(name.casefold(), ()))
+    return sorted(resolved, key=phonebook_group_sort_key)
+
+
+def _feed_response(snapshot: FeedSnapshot) -> Response:
+    encoding = negotiate_encoding(snapshot, request.accept_encodings)
+    body, etag = snapshot.select(encoding)
+    response = Response(body, content_type="application/xml; charset=utf-8")
+    if encoding:
+        response.content_encoding = encoding
+    response.vary.add("Accept-Encoding")
+    response.set_etag(etag)
+    response.last_modified = snapshot.last_modified
+    # Handsets must revalidate on every refresh; unchanged books cost a 304.
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+@bp.route("/lookup", methods=["GET"])
+def lookup_number():
+    number = (request.args.get("number") or "").strip()
+    if not number:
+        return jsonify({"error": "missing number"}), 400
+    # Keyed by generation: any committed change, from any worker, empties the cache
+    generation = fetch_generation()
+    cache = _lookup_cache()
+    result = cache.get(number, generation)
+    if result is None:
+        match, contacts = fetch_number_matches(
+            number,
+            suffix_digits=tenant_config()["LOOKUP_SUFFIX_DIGITS"],
+        )
+        result = {"number": number, "match": match, "contacts": contacts}
+        cache.put(number, result, generation)
+    return jsonify(result), 200 if result["contacts"] else 404
+
+
+@bp.route("/api/contacts", methods=["GET"])
+def api_list_contacts():
+    config = tenant_config()
+    search = (request.args.get("q") or "").strip()
+    try:
+        limit = int(request.args.get("limit") or config["CONTACTS_PAGE_SIZE"])
+    except ValueError:
+        return _api_error("limit must be an integer", 400)
+    contacts, has_more = fetch_contact_page(
+        config["DEFAULT_GROUP_NAME"],
+        limit=min(max(limit, 1), config["API_PAGE_LIMIT"]),
+        search=search,
+        after=_decode_page_key(request.args.get("after")),
+    )
+    return jsonify(
+        {
+            "contacts": [_contact_json(contact) for contact in contacts],
+            "next": _encode_page_key(contacts[-1]) if has_more else None,
+            "total": count_contacts(search) if search else _contact_summary().total,
+        }
+    )
+
+
+@bp.route("/api/contacts/<int:contact_id>", methods=["GET"])
+def api_get_contact(contact_id: int):
+    contact = fetch_contact(contact_id)
+    if contact is None:
+        return _api_error("contact not found", 404)
+    return jsonify(_contact_json(contact))
+
+
+@bp.route("/api/contacts", methods=["POST"])
+def api_create_contact():
+    values, errors = _validate_contact(request.get_json(silent=True))
+    if errors:
+        return jsonify({"errors": errors}), 422
+    contact_id = insert_contact(**values)
+    _publish_phonebook(values["group_name"])
+    response = jsonify(_contact_json(fetch_contact(contact_id) or {}))
+    response.status_code = 201
+    response.headers["Location"] = url_for(".api_get_contact", contact_id=contact_id)
+    return response
+
+
+@bp.route("/api/contacts/<int:contact_id>", methods=["PATCH"])
+def api_update_contact(contact_id: int):
+    existing = fetch_contact(contact_id)
+    if existing is None:
+        return _api_error("contact not found", 404)
+    values, errors = _validate_contact(request.get_json(silent=True), existing)
+    if errors:
+        return jsonify({"errors": errors}), 422
+    if not update_contact(contact_id, **values):
+        return _api_error("contact not found", 404)
+    _publish_phonebook(existing["group_name"], values["group_name"])
+    return jsonify(_contact_json(fetch_contact(contact_id) or {}))
+
+
+@bp.route("/api/contacts/<int:contact_id>", methods=["DELETE"])
+def api_delete_contact(contact_id: int):
+    existing = fetch_contact(contact_id)
+    if existing is None:
+        return _api_error("contact not found", 404)
+    delete_contact(contact_id)
+    _publish_phonebook(existing["group_name"])
+    return Response(status=204)
+
+
+@bp.route("/api/contacts:batch", methods=["POST"])
+def api_batch_contacts():
+    # {"operations": [{"op": "create", "contact": {...}},
+    #                 {"op": "update", "id": 3, "contact": {...}},
+    #                 {"op": "delete", "id": 4}]}
+    # Either every operation is applied in one transaction followed by a
+    # single publish, or none is and the per-item results say why.
+    payload = request.get_json(silent=True)
+    operations = payload.get("operations") if isinstance(payload, dict) else None
+    if not isinstance(operations, list):
+        return _api_error("body must be an object with an 'operations' list", 400)
+    if len(operations) > tenant_config()["API_BATCH_LIMIT"]:
+        return _api_error(
+            f"at most {tenant_config()['API_BATCH_LIMIT']} operations per batch", 413
+        )
+
+    changes: List[ContactChange] = []
+    results: List[Dict[str, object]] = []
+    for index, operation in enumerate(operations):
+        change, errors = _parse_batch_operation(operation)
+        results.append({"index": index, "errors": errors} if errors else {"index": index})
+        if change is not None:
+            changes.append(change)
+    if len(changes) != len(operations):
+        return jsonify({"applied": False, "results": results}), 422
+
+    outcomes = apply_contact_changes(changes)
+    applied = [outcome for outcome in outcomes if outcome is not None]
+    if len(applied) != len(outcomes):
+        for result, outcome in zip(results, outcomes):
+            if outcome is None:
+                result["errors"] = {"id": "contact not found"}
+        return jsonify({"applied": False, "results": results}), 422
+
+    for result, change, outcome in zip(results, changes, applied):
+        result.update(op=change.action, id=outcome.contact_id)
+        _publisher().mark_changed(
+            *(group for group in (outcome.previous_group, outcome.group) if group is not None)
+        )
+    if changes:
+        _publish_phonebook()
+    return jsonify({"applied": True, "results": results})
+
+
+@bp.route("/changes", methods=["GET"])
+def changes():
+    # Deltas since the generation a client last saw; pass the returned
+    # generation as `since` next time. Answers with the full contact list
+    # when the journal no longer reaches back that far.
+    config = tenant_config()
+    try:
+        since = int(request.args.get("since") or 0)
+        limit = int(request.args.get("limit") or config["API_PAGE_LIMIT"])
+    except ValueError:
+        return _api_error("since and limit must be integers", 400)
+    result = fetch_changes(since, limit=min(max(limit, 1), config["API_PAGE_LIMIT"]))
+    if result is None:
+        generation, rows = iter_contact_snapshot()
+        return Response(
+            stream_with_context(_iter_full_snapshot(generation, rows)),
+            content_type="application/json",
+        )
+    generation, entries, more = result
+    return jsonify(
+        {
+            "full": False,
+            "generation": generation,
+            "more": more,
+            "changes": [_change_json(entry) for entry in entries],
+        }
+    )
+
+
+def _change_json(entry: ChangeEntry) -> Dict[str, object]:
+    if entry.contact is None:
+        return {"generation": entry.generation, "action": "delete", "id": entry.contact_id}
+    return {"generation": entry.generation, "action": "upsert", **_contact_json(entry.contact)}
+
+
+def _iter_full_snapshot(generation: int, rows: Iterable[Mapping]) -> Iterable[str]:
+    yield f'{{"full": true, "generation": {generation}, "more": false, "contacts": ['
+    separator = ""
+    for row in rows:
+        yield separator + json.dumps(_contact_json(row))
+        separator = ","
+    yield "]}"
+
+
+def _parse_batch_operation(operation: object) -> Tuple[Optional[ContactChange], Dict[str, str]]:
+    if not isinstance(operation, dict):
+        return None, {"op": "operation must be an object"}
+    action = operation.get("op")
+    if action not in ("create", "update", "delete"):
+        return None, {"op": "op must be create, update or delete"}
+    contact_id = operation.get("id")
+    if action == "create":
+        values, errors = _validate_contact(operation.get("contact"))
+        return (None if errors else ContactChange(action, None, values)), errors
+    if not isinstance(contact_id, int) or isinstance(contact_id, bool):
+        return None, {"id": "id must be an integer"}
+    if action == "delete":
+        return ContactChange(action, contact_id), {}
+    existing = fetch_contact(contact_id)
+    if existing is None:
+        return None, {"id": "contact not found"}
+    values, errors = _validate_contact(operation.get("contact"), existing)
+    return (None if errors else ContactChange(action, contact_id, values)), errors
+
+
+def _validate_contact(
+    payload: object,
+    existing: Optional[Mapping] = None,
+) -> Tuple[Dict[str, str], Dict[str, str]]:
+    # Returns (values, errors). With `existing` this is a partial update:
+    # fields missing from the payload keep their current value.
+    if not isinstance(payload, dict):
+        return {}, {"contact": "body must be a JSON object"}
+    language = _get_language()
+    values: Dict[str, str] = {}
+    errors: Dict[str, str] = {}
+    for field in CONTACT_FIELDS:
+        if field in payload:
+            value = payload[field]
+        else:
+            value = existing.get(field) if existing else None
+        if value is not None and not isinstance(value, str):
+            errors[field] = "must be a string"
+            continue
+        values[field] = (value or "").strip()
+    if errors:
+        return values, errors
+    if not values["group_name"]:
+        values["group_name"] = tenant_config()["DEFAULT_GROUP_NAME"]
+    if not values["name"]:
+        errors["name"] = get_message(language, "contact_name_required")
+    ui_strings = get_ui_strings(language)
+    for field in PHONE_LABEL_KEYS:
+        if _invalid_phone_labels({field: values[field]}, ui_strings):
+            errors[field] = get_message(
+                language,
+                "invalid_phone",
+                fields=ui_strings[PHONE_LABEL_KEYS[field]],
+            )
+    return values, errors
+
+
+def _contact_json(contact: Mapping) -> Dict[str, object]:
+    return {"id": contact["id"], **{field: contact[field] or "" for field in CONTACT_FIELDS}}
+
+
+def _api_error(message: str, status: int) -> Tuple[Response, int]:
+    return jsonify({"error": message}), status
 
 
 @bp.route("/set-language", methods=["POST"])
 def set_language():
     language = resolve_language(request.form.get("language"))
     session["language"] = language
-    return redirect(url_for("main.index"))
+    return redirect(url_for(".index"))
+
+
+@bp.route("/replica.json", methods=["GET"])
+def replica_api():
+    replica: Optional[ReplicaSync] = current_app.extensions.get("replica_sync")
+    if replica is None:
+        return _api_error("not a replica", 404)
+    return jsonify(replica_status(replica.source, current_app.config["REPLICA_OF"]))
 
 
 @bp.route("/status.json", methods=["GET"])
@@ -223,7 +936,7 @@ def status_api():
         key: dict(value) if isinstance(value, dict) else value
         for key, value in raw_status.items()
     }
-    current_version = current_app.config["APP_VERSION"]
+    current_version = tenant_config()["APP_VERSION"]
     for source in ("github", "docker"):
         info = status.get(source, {})
         remote_version = info.get("version")
@@ -239,9 +952,34 @@ def status_api():
         elif not state:
             info["status"] = "unknown"
     status["current_version"] = current_version
+    status["database"] = fetch_pragma_values()
+    summary = _contact_summary()
+    # Per worker: what this process holds for the list page
+    status["contacts"] = {
+        "generation": summary.generation,
+        "total": summary.total,
+        "groups": len(summary.group_names),
+        "summary_bytes": summary.size_bytes(),
+        "summary_build_seconds": round(summary.build_seconds, 6),
+    }
     return jsonify(status)
 
 
+def _encode_page_key(contact: Mapping) -> str:
+    payload = json.dumps([contact["sort_group"], contact["sort_name"], contact["id"]])
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def _decode_page_key(token: Optional[str]) -> Optional[PageKey]:
+    if not token:
+        return None
+    try:
+        group, name, contact_id = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+        return PageKey(str(group), str(name), int(contact_id))
+    except (ValueError, TypeError):
+        return None
+
+
 def _get_language() -> str:
     language = session.get("language")
     resolved = resolve_language(language)
@@ -1,74 +1,147 @@
 from __future__ import annotations
 
+import http.client
 import json
+import os
 import re
+import threading
 import time
 import urllib.error
 import urllib.request
-from dataclasses import dataclass
-from typing import Dict, Iterable, Optional, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
 
 from flask import current_app
 
+from .locking import file_lock
+from .metrics import STATUS_FETCHES
+from .xml_utils import write_atomic
+
 StatusPayload = Dict[str, Dict[str, Optional[str]]]
 
-_CACHE: Dict[str, object] = {"timestamp": 0.0, "data": None}
+DEFAULT_GITHUB_API_URL = "https://api.github.com"
+DEFAULT_DOCKER_HUB_API_URL = "https://hub.docker.com"
+
+_LOCK = threading.Lock()
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_EXECUTOR_PID: Optional[int] = None
+_REFRESH: Optional[Future] = None
+# Last parsed cache file, reused while its (inode, mtime_ns, size) is unchanged
+_STATE_MEMO: Dict[str, Any] = {"path": None, "key": None, "state": None}
 
 
 @dataclass
 class SourceStatus:
     status: str
     version: Optional[str]
+    etag: Optional[str] = None
 
 
-def _http_get(url: str, timeout: float = 5.0) -> str:
-    request = urllib.request.Request(
-        url,
-        headers={
-            "Accept": "application/json",
-            "User-Agent": "YeaBook/1.0",
-        },
-    )
-    with urllib.request.urlopen(request, timeout=timeout) as response:  # type: ignore[call-arg]
-        data = response.read().decode("utf-8")
-    return data
+# Everything a refresh needs, captured from the app config so the work can
+# run on a pool thread without an application context.
+@dataclass(frozen=True)
+class _StatusSources:
+    github_repo: str
+    docker_image: str
+    github_api_url: str
+    docker_api_url: str
+    cache_path: Path
+    timeout: float
+    backoff: float
+    ttl: float
 
 
-def _fetch_github_latest(repo: str) -> SourceStatus:
-    api_url = f"https://api.github.com/repos/{repo}/releases/latest"
+def _http_get(
+    url: str,
+    timeout: float = 5.0,
+    etag: Optional[str] = None,
+) -> Tuple[Optional[str], Optional[str]]:
+    # Returns (body, etag); body is None when the server answered 304 to our
+    # If-None-Match, which neither API counts against the rate limit.
+    headers = {
+        "Accept": "application/json",
+        "User-Agent": "YeaBook/1.0",
+    }
+    if etag:
+        headers["If-None-Match"] = etag
+    request = urllib.request.Request(url, headers=headers)
     try:
-        body = _http_get(api_url)
-        payload = json.loads(body)
-        tag_name = payload.get("tag_name")
-        if isinstance(tag_name, str) and tag_name.strip():
-            return SourceStatus(status="up_to_date", version=tag_name.strip())
-    except urllib.error.URLError:
-        return SourceStatus(status="unreachable", version=None)
-    except json.JSONDecodeError:
-        return SourceStatus(status="unknown", version=None)
-    return SourceStatus(status="unknown", version=None)
+        with urllib.request.urlopen(request, timeout=timeout) as response:  # type: ignore[call-arg]
+            data = response.read().decode("utf-8")
+            return data, response.headers.get("ETag")
+    except urllib.error.HTTPError as error:
+        if error.code == 304:
+            return None, etag
+        raise
+
+
+def github_api_url(repo: str, base_url: str = DEFAULT_GITHUB_API_URL) -> str:
+    return f"{base_url.rstrip('/')}/repos/{repo}/releases/latest"
 
 
-def _fetch_docker_latest(image: str) -> SourceStatus:
+def docker_api_url(image: str, base_url: str = DEFAULT_DOCKER_HUB_API_URL) -> str:
     namespace, _, name = image.partition("/")
     if not name:
         # If no namespace was provided assume 'library'
         namespace, name = "library", namespace
-    api_url = (
-        f"https://hub.docker.com/v2/repositories/{namespace}/{name}/tags?page_size=25&page=1"
-    )
+    return f"{base_url.rstrip('/')}/v2/repositories/{namespace}/{name}/tags?page_size=25&page=1"
+
+
+def _fetch_payload(
+    api_url: str,
+    timeout: float,
+    previous: Optional[SourceStatus],
+) -> Tuple[Optional[SourceStatus], Optional[Dict[str, Any]], Optional[str]]:
+    # Returns (status, None, None) when the fetch settles the status by itself
+    # (304, network failure, malformed body), else (None, payload, etag).
     try:
-        body = _http_get(api_url)
-        payload = json.loads(body)
-        results = payload.get("results") or []
-        versions = _filter_semver_tags(result.get("name") for result in results)
-        if versions:
-            version = max(versions, key=_semver_key)
-            return SourceStatus(status="up_to_date", version=version)
-    except urllib.error.URLError:
-        return SourceStatus(status="unreachable", version=None)
-    except json.JSONDecodeError:
+        body, etag = _http_get(api_url, timeout, previous.etag if previous else None)
+        if body is None and previous is not None:
+            return previous, None, None
+        payload = json.loads(body or "")
+    except (OSError, http.client.HTTPException):
+        # URLError, timeouts, resets and truncated responses alike
+        return SourceStatus(status="unreachable", version=None), None, None
+    except ValueError:
+        return SourceStatus(status="unknown", version=None), None, None
+    if not isinstance(payload, dict):
+        return SourceStatus(status="unknown", version=None), None, None
+    return None, payload, etag
+
+
+def _fetch_github_latest(
+    api_url: str,
+    timeout: float = 5.0,
+    previous: Optional[SourceStatus] = None,
+) -> SourceStatus:
+    status, payload, etag = _fetch_payload(api_url, timeout, previous)
+    if status is not None:
+        return status
+    tag_name = payload.get("tag_name") if payload else None
+    if isinstance(tag_name, str) and tag_name.strip():
+        return SourceStatus(status="up_to_date", version=tag_name.strip(), etag=etag)
+    return SourceStatus(status="unknown", version=None)
+
+
+def _fetch_docker_latest(
+    api_url: str,
+    timeout: float = 5.0,
+    previous: Optional[SourceStatus] = None,
+) -> SourceStatus:
+    status, payload, etag = _fetch_payload(api_url, timeout, previous)
+    if status is not None:
+        return status
+    results = payload.get("results") if payload else None
+    if not isinstance(results, list):
         return SourceStatus(status="unknown", version=None)
+    versions = _filter_semver_tags(
+        result.get("name") for result in results if isinstance(result, dict)
+    )
+    if versions:
+        version = max(versions, key=_semver_key)
+        return SourceStatus(status="up_to_date", version=version, etag=etag)
     return SourceStatus(status="unknown", version=None)
 
 
@@ -147,25 +220,156 @@ def _normalize_version_string(value: str) -> Optional[str]:
     return stripped[1:] if stripped.startswith("v") else stripped
 
 
-def get_release_status() -> StatusPayload:
-    ttl = float(current_app.config.get("STATUS_CACHE_TTL", 300))
-    now = time.time()
-    cached_ts = _CACHE.get("timestamp", 0.0)
-    cached_data = _CACHE.get("data")
-    if cached_data and isinstance(cached_ts, float) and now - cached_ts < ttl:
-        return cached_data  # type: ignore[return-value]
+def _status_sources() -> _StatusSources:
+    config = current_app.config
+    return _StatusSources(
+        github_repo=config["GITHUB_REPO"],
+        docker_image=config["DOCKER_IMAGE"],
+        github_api_url=config.get("GITHUB_API_URL", DEFAULT_GITHUB_API_URL),
+        docker_api_url=config.get("DOCKER_HUB_API_URL", DEFAULT_DOCKER_HUB_API_URL),
+        cache_path=Path(config["STATUS_CACHE_FILE"]),
+        timeout=float(config.get("STATUS_HTTP_TIMEOUT", 5.0)),
+        backoff=float(config.get("STATUS_RETRY_BACKOFF", 30.0)),
+        ttl=float(config.get("STATUS_CACHE_TTL", 300)),
+    )
 
-    github_repo = current_app.config["GITHUB_REPO"]
-    docker_image = current_app.config["DOCKER_IMAGE"]
 
-    github_status = _fetch_github_latest(github_repo)
-    docker_status = _fetch_docker_latest(docker_image)
+def _empty_state() -> Dict[str, Any]:
+    # "sources" maps each API URL to its last SourceStatus (including ETag)
+    return {"timestamp": 0.0, "data": None, "failures": 0, "retry_at": 0.0, "sources": {}}
 
-    data: StatusPayload = {
-        "github": {"status": github_status.status, "version": github_status.version},
-        "docker": {"status": docker_status.status, "version": docker_status.version},
+
+def _read_state(path: Path) -> Dict[str, Any]:
+    # Shared by every worker; the file is only ever replaced whole.
+    try:
+        stat_result = path.stat()
+    except FileNotFoundError:
+        return _empty_state()
+    key = (stat_result.st_ino, stat_result.st_mtime_ns, stat_result.st_size)
+    with _LOCK:
+        if _STATE_MEMO["path"] == path and _STATE_MEMO["key"] == key:
+            return _STATE_MEMO["state"]
+    try:
+        state = {**_empty_state(), **json.loads(path.read_text(encoding="utf-8"))}
+    except (FileNotFoundError, ValueError):
+        return _empty_state()
+    with _LOCK:
+        _STATE_MEMO.update(path=path, key=key, state=state)
+    return state
+
+
+def _write_state(path: Path, state: Dict[str, Any]) -> None:
+    write_atomic(path, json.dumps(state).encode("utf-8"))
+
+
+def _is_due(state: Dict[str, Any], ttl: float, now: float) -> bool:
+    fresh = bool(state["data"]) and now - float(state["timestamp"]) < ttl
+    return not fresh and now >= float(state["retry_at"])
+
+
+def _executor() -> ThreadPoolExecutor:
+    # Called with _LOCK held. Pool threads do not survive a fork, so every
+    # gunicorn worker builds its own.
+    global _EXECUTOR, _EXECUTOR_PID, _REFRESH
+    pid = os.getpid()
+    if _EXECUTOR is None or _EXECUTOR_PID != pid:
+        _EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="release-status")
+        _EXECUTOR_PID = pid
+        _REFRESH = None
+    return _EXECUTOR
+
+
+def _start_refresh(sources: _StatusSources) -> Future:
+    # Called with _LOCK held; concurrent callers share the refresh in flight.
+    global _REFRESH
+    executor = _executor()
+    if _REFRESH is None or _REFRESH.done():
+        _REFRESH = executor.submit(_refresh, executor, sources)
+    return _REFRESH
+
+
+def _refresh(executor: ThreadPoolExecutor, sources: _StatusSources) -> StatusPayload:
+    # The file lock makes workers queue up behind the one that is fetching;
+    # they find its result on re-reading the state and skip the network.
+    with file_lock(sources.cache_path.with_name(sources.cache_path.name + ".lock")):
+        state = _read_state(sources.cache_path)
+        if not _is_due(state, sources.ttl, time.time()):
+            return state["data"]
+        previous = {
+            url: SourceStatus(**source) for url, source in state["sources"].items()
+        }
+        github_url = github_api_url(sources.github_repo, sources.github_api_url)
+        docker_url = docker_api_url(sources.docker_image, sources.docker_api_url)
+        docker_future = executor.submit(
+            _fetch_docker_latest,
+            docker_url,
+            sources.timeout,
+            previous.get(docker_url),
+        )
+        github_status = _fetch_github_latest(github_url, sources.timeout, previous.get(github_url))
+        docker_status = docker_future.result()
+        for name, url, status in (
+            ("github", github_url, github_status),
+            ("docker", docker_url, docker_status),
+        ):
+            # A 304 hands back the cached SourceStatus object itself
+            outcome = "not_modified" if status is previous.get(url) else status.status
+            STATUS_FETCHES.inc(source=name, outcome=outcome)
+        fetched: StatusPayload = {
+            "github": {"status": github_status.status, "version": github_status.version},
+            "docker": {"status": docker_status.status, "version": docker_status.version},
+        }
+        state = _merge_refresh(state, fetched, sources)
+        validators: Dict[str, Any] = {}
+        for url, status in ((github_url, github_status), (docker_url, docker_status)):
+            kept = previous.get(url) if status.status == "unreachable" else status
+            if kept is not None and kept.etag:
+                validators[url] = asdict(kept)
+        state["sources"] = validators
+        _write_state(sources.cache_path, state)
+    return state["data"]
+
+
+def _merge_refresh(
+    state: Dict[str, Any],
+    fetched: StatusPayload,
+    sources: _StatusSources,
+) -> Dict[str, Any]:
+    now = time.time()
+    state = dict(state)
+    previous = state["data"] or {}
+    failed = [name for name, info in fetched.items() if info["status"] == "unreachable"]
+    data = dict(fetched)
+    for name in failed:
+        # Keep serving the last good answer for a source that is down
+        if name in previous and previous[name]["status"] != "unreachable":
+            data[name] = previous[name]
+    state["data"] = data
+    if failed:
+        # Retry after 1x, 2x, 4x ... the backoff, never later than a TTL
+        failures = int(state["failures"]) + 1
+        state["failures"] = failures
+        state["retry_at"] = now + min(sources.backoff * 2 ** (failures - 1), sources.ttl)
+    else:
+        state["timestamp"] = now
+        state["failures"] = 0
+        state["retry_at"] = 0.0
+    return state
+
+
+def _pending_status() -> StatusPayload:
+    return {
+        "github": {"status": "pending", "version": None},
+        "docker": {"status": "pending", "version": None},
     }
 
-    _CACHE["timestamp"] = now
-    _CACHE["data"] = data
-    return data
+
+def get_release_status() -> StatusPayload:
+    # Never waits for the network: stale (or no) data is returned at once and
+    # a single background refresh brings the shared cache up to date.
+    sources = _status_sources()
+    state = _read_state(sources.cache_path)
+    if _is_due(state, sources.ttl, time.time()):
+        with _LOCK:
+            _start_refresh(sources)
+    return state["data"] or _pending_status()
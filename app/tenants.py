@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import json
+import re
+import threading
+from collections import ChainMap, OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Mapping, MutableMapping, Optional
+
+from flask import current_app, g
+
+TENANT_NAME_PATTERN = re.compile(r"^[a-z0-9][a-z0-9_-]{0,62}$")
+TENANT_SETTINGS_FILE = "tenant.json"
+# Keys a tenant may override in its tenant.json; everything else is shared
+TENANT_SETTINGS = (
+    "PHONEBOOK_TITLE",
+    "PHONEBOOK_PROMPT",
+    "DEFAULT_GROUP_NAME",
+    "PHONEBOOK_PAGE_SIZE",
+    "LOOKUP_COUNTRY_CODE",
+)
+
+
+@dataclass
+class Tenant:
+    # "" is the default directory served without a /t/<tenant> prefix
+    name: str
+    config: Mapping[str, Any]
+    # Per-directory objects (connection pool, publisher, caches), keyed like
+    # app.extensions; the default tenant uses app.extensions itself.
+    extensions: MutableMapping[str, Any]
+
+
+def current_tenant() -> Tenant:
+    tenant = g.get("tenant")
+    if tenant is None:
+        return current_app.extensions["default_tenant"]
+    return tenant
+
+
+def tenant_config() -> Mapping[str, Any]:
+    return current_tenant().config
+
+
+def load_tenant_settings(directory: Path) -> Dict[str, Any]:
+    path = directory / TENANT_SETTINGS_FILE
+    try:
+        raw = json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+    if not isinstance(raw, dict):
+        raise ValueError(f"{path} must contain a JSON object")
+    unknown = sorted(set(raw) - set(TENANT_SETTINGS))
+    if unknown:
+        raise ValueError(f"Unsupported settings in {path}: {', '.join(unknown)}")
+    return raw
+
+
+class _Entry:
+    # Registered before the tenant is opened; requests for the same tenant
+    # wait on `ready` while everyone else keeps using the registry.
+    def __init__(self, tenant: Tenant) -> None:
+        self.tenant = tenant
+        self.ready = threading.Event()
+        self.error: Optional[BaseException] = None
+
+
+# Tenants are the sub-directories of `root`; each one holds its own
+# contacts.db and phonebook.xml. Only the `capacity` most recently used
+# tenants stay open, so one process can serve many small directories.
+class TenantRegistry:
+    def __init__(
+        self,
+        root: Path,
+        base_config: Mapping[str, Any],
+        *,
+        capacity: int,
+        open_tenant: Callable[[Tenant], None],
+        close_tenant: Callable[[Tenant], None],
+    ) -> None:
+        self.root = root
+        self._base_config = base_config
+        self.capacity = max(capacity, 1)
+        self._open_tenant = open_tenant
+        self._close_tenant = close_tenant
+        self._tenants: "OrderedDict[str, _Entry]" = OrderedDict()
+        # Guards the table only; opening and closing happen outside it
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> Optional[Tenant]:
+        if not TENANT_NAME_PATTERN.match(name):
+            return None
+        evicted: List[_Entry] = []
+        with self._lock:
+            entry = self._tenants.get(name)
+            opening = entry is None
+            if entry is not None:
+                self._tenants.move_to_end(name)
+            else:
+                directory = self.root / name
+                if not directory.is_dir():
+                    return None
+                entry = _Entry(self._build(name, directory))
+                self._tenants[name] = entry
+                while len(self._tenants) > self.capacity:
+                    evicted.append(self._tenants.popitem(last=False)[1])
+        if opening:
+            try:
+                self._open_tenant(entry.tenant)
+            except BaseException as error:
+                entry.error = error
+                with self._lock:
+                    if self._tenants.get(name) is entry:
+                        del self._tenants[name]
+                raise
+            finally:
+                entry.ready.set()
+        else:
+            entry.ready.wait()
+            if entry.error is not None:
+                raise RuntimeError(f"Opening tenant {name!r} failed") from entry.error
+        for old in evicted:
+            self._close(old)
+        return entry.tenant
+
+    def close_all(self) -> None:
+        with self._lock:
+            entries = list(self._tenants.values())
+            self._tenants.clear()
+        for entry in entries:
+            self._close(entry)
+
+    def _close(self, entry: _Entry) -> None:
+        # An entry can be evicted while it is still being opened
+        entry.ready.wait()
+        if entry.error is None:
+            self._close_tenant(entry.tenant)
+
+    def _build(self, name: str, directory: Path) -> Tenant:
+        paths = {
+            "DATABASE": str(directory / "contacts.db"),
+            "XML_FILE": str(directory / "phonebook.xml"),
+        }
+        config = ChainMap(paths, load_tenant_settings(directory), self._base_config)
+        return Tenant(name=name, config=config, extensions={})
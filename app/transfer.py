@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import csv
+import io
+import re
+from typing import Dict, IO, Iterable, Iterator, List, Mapping, Optional
+
+CSV_FIELDS = ("name", "group_name", "telephone", "mobile", "other")
+# Alternative CSV headers accepted on import -> contact field
+CSV_HEADER_ALIASES: Dict[str, str] = {
+    "group": "group_name",
+    "phone": "telephone",
+    "phone1": "telephone",
+    "phone2": "mobile",
+    "phone3": "other",
+}
+VCARD_EXTENSIONS = (".vcf", ".vcard")
+VCARD_MIMETYPES = ("text/vcard", "text/x-vcard", "text/directory")
+
+# RFC 6350 3.4 text escapes; any other escaped character stands for itself
+_VCARD_ESCAPE = re.compile(r"\\(.)", re.DOTALL)
+_VCARD_ESCAPES = {"n": "\n", "N": "\n"}
+
+# Separators people type into numbers; dropped before PHONE_PATTERN validation
+_PHONE_SEPARATORS = re.compile(r"[\s\-()/.]")
+
+ImportRecord = Dict[str, str]
+
+
+def is_vcard_upload(filename: Optional[str], mimetype: Optional[str]) -> bool:
+    if filename and filename.lower().endswith(VCARD_EXTENSIONS):
+        return True
+    return (mimetype or "").lower() in VCARD_MIMETYPES
+
+
+def clean_phone(value: Optional[str]) -> str:
+    return _PHONE_SEPARATORS.sub("", value or "")
+
+
+def _record(name: str, group_name: str, telephone: str, mobile: str, other: str) -> ImportRecord:
+    return {
+        "name": name.strip(),
+        "group_name": group_name.strip(),
+        "telephone": clean_phone(telephone),
+        "mobile": clean_phone(mobile),
+        "other": clean_phone(other),
+    }
+
+
+def iter_csv_records(stream: IO[bytes]) -> Iterator[ImportRecord]:
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    reader = csv.DictReader(text)
+    for row in reader:
+        values: Dict[str, str] = {}
+        for header, value in row.items():
+            if header is None:
+                continue
+            key = header.strip().lower()
+            values[CSV_HEADER_ALIASES.get(key, key)] = value or ""
+        yield _record(
+            values.get("name", ""),
+            values.get("group_name", ""),
+            values.get("telephone", ""),
+            values.get("mobile", ""),
+            values.get("other", ""),
+        )
+
+
+def _unfolded_lines(stream: IO[bytes]) -> Iterator[str]:
+    # RFC 6350 3.2: a line starting with a space or tab continues the previous one
+    pending: Optional[str] = None
+    for raw in io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""):
+        line = raw.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and pending is not None:
+            pending += line[1:]
+            continue
+        if pending is not None:
+            yield pending
+        pending = line
+    if pending is not None:
+        yield pending
+
+
+def _vcard_unescape(value: str) -> str:
+    # One pass, so an escaped backslash is never read as part of the next escape
+    return _VCARD_ESCAPE.sub(
+        lambda match: _VCARD_ESCAPES.get(match.group(1), match.group(1)),
+        value,
+    )
+
+
+def _split_unescaped(value: str, separator: str) -> List[str]:
+    # Splits on separators that are not escaped; the parts stay escaped
+    parts = [""]
+    escaped = False
+    for char in value:
+        if char == separator and not escaped:
+            parts.append("")
+            continue
+        parts[-1] += char
+        escaped = char == "\\" and not escaped
+    return parts
+
+
+def _phone_slot(params: List[str]) -> str:
+    types = set()
+    for param in params:
+        key, _, value = param.partition("=")
+        if value and key.upper() == "TYPE":
+            types.update(part.strip('"').upper() for part in value.split(","))
+        elif not value:
+            types.add(key.upper())
+    if "CELL" in types:
+        return "mobile"
+    if "WORK" in types or "VOICE" in types:
+        return "telephone"
+    return "other"
+
+
+def iter_vcard_records(stream: IO[bytes]) -> Iterator[ImportRecord]:
+    card: Optional[Dict[str, str]] = None
+    phones: List[str] = []
+    for line in _unfolded_lines(stream):
+        prop, sep, value = line.partition(":")
+        if not sep:
+            continue
+        name, *params = prop.split(";")
+        # Drop group prefixes such as "item1.TEL"
+        name = name.rpartition(".")[2].upper()
+        if name == "BEGIN" and value.strip().upper() == "VCARD":
+            card, phones = {}, []
+        elif card is None:
+            continue
+        elif name == "END":
+            yield _vcard_record(card, phones)
+            card = None
+        elif name == "FN":
+            card["name"] = _vcard_unescape(value)
+        elif name == "N" and "n" not in card:
+            family, given = (_split_unescaped(value, ";") + ["", ""])[:2]
+            card["n"] = f"{_vcard_unescape(given)} {_vcard_unescape(family)}".strip()
+        elif name == "CATEGORIES" and "group_name" not in card:
+            card["group_name"] = _vcard_unescape(_split_unescaped(value, ",")[0])
+        elif name == "TEL":
+            slot = _phone_slot(params)
+            number = value[4:] if value.lower().startswith("tel:") else value
+            if slot not in card:
+                card[slot] = number
+            else:
+                phones.append(number)
+
+
+def _vcard_record(card: Mapping[str, str], extra_phones: List[str]) -> ImportRecord:
+    slots = {slot: card.get(slot, "") for slot in ("telephone", "mobile", "other")}
+    # Numbers that lost their preferred slot fill whatever is still empty
+    for number in extra_phones:
+        for slot in ("telephone", "mobile", "other"):
+            if not slots[slot]:
+                slots[slot] = number
+                break
+    return _record(
+        card.get("name") or card.get("n", ""),
+        card.get("group_name", ""),
+        slots["telephone"],
+        slots["mobile"],
+        slots["other"],
+    )
+
+
+def iter_csv_export(rows: Iterable[Mapping]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_FIELDS)
+    for row in rows:
+        writer.writerow([row[field] or "" for field in CSV_FIELDS])
+        # Hand out what accumulated so memory stays bounded by a few rows
+        if buffer.tell() > 8192:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _vcard_escape(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\")
+        .replace(",", "\\,")
+        .replace(";", "\\;")
+        .replace("\n", "\\n")
+    )
+
+
+def iter_vcard_export(rows: Iterable[Mapping]) -> Iterator[str]:
+    for row in rows:
+        name = _vcard_escape(row["name"] or "")
+        lines = [
+            "BEGIN:VCARD",
+            "VERSION:3.0",
+            f"FN:{name}",
+            f"N:;{name};;;",
+        ]
+        if row["group_name"]:
+            lines.append(f"CATEGORIES:{_vcard_escape(row['group_name'])}")
+        for field, phone_type in (
+            ("telephone", "WORK,VOICE"),
+            ("mobile", "CELL"),
+            ("other", "OTHER"),
+        ):
+            if row[field]:
+                lines.append(f"TEL;TYPE={phone_type}:{row[field]}")
+        lines.append("END:VCARD")
+        yield "\r\n".join(lines) + "\r\n"
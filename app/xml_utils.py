@@ -1,73 +1,272 @@
-from collections import defaultdict
+import os
+import tempfile
+import zlib
+from itertools import groupby
 from pathlib import Path
-from typing import Dict, Iterable, Mapping
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
 from xml.etree import ElementTree as ET
 
+from .locking import file_lock
 
-def contacts_to_elementtree(
-    contacts: Iterable[Mapping],
-    *,
-    title: str,
-    prompt: str,
-    default_group: str,
-) -> ET.ElementTree:
-    root = ET.Element("YealinkIPPhoneBook")
-    title_el = ET.SubElement(root, "Title")
-    title_el.text = title
-    if prompt:
-        prompt_el = ET.SubElement(root, "Prompt")
-        prompt_el.text = prompt
-
-    grouped_contacts: Dict[str, list[Mapping]] = defaultdict(list)
-    for entry in contacts:
-        group_name = (entry.get("group_name") or "").strip() or default_group
-        grouped_contacts[group_name].append(entry)
-
-    for group_name in sorted(grouped_contacts.keys(), key=str.lower):
-        menu_el = ET.SubElement(root, "Menu", Name=group_name)
-        for entry in sorted(
-            grouped_contacts[group_name],
-            key=lambda item: (item.get("name") or "").lower(),
-        ):
-            name = (entry.get("name") or "").strip()
-            unit_attrs = {
-                "Name": name,
-                "Phone1": (entry.get("telephone") or "").strip(),
-                "Phone2": (entry.get("mobile") or "").strip(),
-                "Phone3": (entry.get("other") or "").strip(),
-                "default_photo": "Resource:",
+try:
+    import brotli  # type: ignore[import-not-found]
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Content-Encoding token -> sidecar suffix appended to the published XML path.
+COMPRESSED_SUFFIXES: Dict[str, str] = {
+    "br": ".br",
+    "gzip": ".gz",
+}
+
+# Matches what ElementTree.write(..., encoding="utf-8", xml_declaration=True) emits.
+XML_DECLARATION = b"<?xml version='1.0' encoding='utf-8'?>\n"
+XML_FOOTER = b"</YealinkIPPhoneBook>"
+
+
+Compressor = Tuple[Callable[[bytes], bytes], Callable[[], bytes]]
+
+
+class _StagedFile:
+    # Written next to its final path and moved into place with os.replace, so
+    # readers only ever see a complete previous or complete new version.
+    def __init__(self, final_path: Path, compressor: Optional[Compressor] = None) -> None:
+        fd, temp_name = tempfile.mkstemp(
+            dir=final_path.parent,
+            prefix=f".{final_path.name}.",
+            suffix=".tmp",
+        )
+        os.fchmod(fd, 0o644)
+        self.final_path = final_path
+        self.temp_path = Path(temp_name)
+        self._handle: BinaryIO = os.fdopen(fd, "wb")
+        self._compressor = compressor
+
+    def write(self, chunk: bytes) -> None:
+        data = self._compressor[0](chunk) if self._compressor else chunk
+        if data:
+            self._handle.write(data)
+
+    def finish(self, *, fsync: bool) -> None:
+        if self._compressor:
+            self._handle.write(self._compressor[1]())
+        self._handle.flush()
+        if fsync:
+            os.fsync(self._handle.fileno())
+        self._handle.close()
+
+    def discard(self) -> None:
+        self._handle.close()
+        self.temp_path.unlink(missing_ok=True)
+
+
+def write_atomic(path: Path, data: bytes, *, fsync: bool = False) -> None:
+    # For sidecar state next to the feed: same mode, same atomic swap
+    path.parent.mkdir(parents=True, exist_ok=True)
+    staged = _StagedFile(path)
+    try:
+        staged.write(data)
+        staged.finish(fsync=fsync)
+        os.replace(staged.temp_path, path)
+    finally:
+        staged.discard()
+
+
+def compressed_variant_path(output_path: Path, encoding: str) -> Path:
+    return output_path.with_name(output_path.name + COMPRESSED_SUFFIXES[encoding])
+
+
+def _gzip_compressor() -> Compressor:
+    # wbits=31 writes a gzip container with a zero mtime, so identical input
+    # always yields an identical sidecar
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 31)
+    return compressor.compress, compressor.flush
+
+
+def _brotli_compressor() -> Compressor:
+    compressor = brotli.Compressor(quality=11)
+    return compressor.process, compressor.finish
+
+
+def _compressor_factories() -> Dict[str, Callable[[], Compressor]]:
+    factories: Dict[str, Callable[[], Compressor]] = {"gzip": _gzip_compressor}
+    if brotli is not None:
+        factories["br"] = _brotli_compressor
+    return factories
+
+
+def compress_variants(body: bytes) -> Dict[str, bytes]:
+    # In-memory counterpart of the sidecars write_chunks produces
+    variants: Dict[str, bytes] = {}
+    for encoding, factory in _compressor_factories().items():
+        compress, flush = factory()
+        variants[encoding] = compress(body) + flush()
+    return variants
+
+
+def generation_path(output_path: Path) -> Path:
+    return output_path.with_name(output_path.name + ".generation")
+
+
+def swap_lock_path(output_path: Path) -> Path:
+    return output_path.with_name(output_path.name + ".swap.lock")
+
+
+def read_generation(output_path: Path) -> int:
+    # Bumped on every publish; lets readers detect a new version without
+    # touching the XML itself.
+    try:
+        return int(generation_path(output_path).read_text(encoding="ascii").strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def _fsync_directory(path: Path) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _escape_cdata(text: str) -> str:
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    return text
+
+
+def _escape_attrib(text: str) -> str:
+    text = _escape_cdata(text)
+    if '"' in text:
+        text = text.replace('"', "&quot;")
+    if "\r" in text:
+        text = text.replace("\r", "&#13;")
+    if "\n" in text:
+        text = text.replace("\n", "&#10;")
+    if "\t" in text:
+        text = text.replace("\t", "&#09;")
+    return text
+
+
+def _encode(text: str) -> bytes:
+    return text.encode("utf-8", "xmlcharrefreplace")
+
+
+def group_ordered_rows(rows: Iterable[Mapping]) -> Iterator[Tuple[str, Iterable[Mapping]]]:
+    # Rows must already be ordered by group and name with the default group
+    # applied, as db.iter_phonebook_rows returns them.
+    return groupby(rows, key=lambda row: row["group_name"])
+
+
+_UNIT_TEMPLATE = (
+    '<Unit Name="{}" Phone1="{}" Phone2="{}" Phone3="{}" default_photo="Resource:" />'
+)
+
+
+def render_menu(group_name: str, entries: Iterable[Mapping]) -> bytes:
+    parts = [f'<Menu Name="{_escape_attrib(group_name)}">']
+    for entry in entries:
+        parts.append(
+            _UNIT_TEMPLATE.format(
+                _escape_attrib((entry["name"] or "").strip()),
+                _escape_attrib((entry["telephone"] or "").strip()),
+                _escape_attrib((entry["mobile"] or "").strip()),
+                _escape_attrib((entry["other"] or "").strip()),
+            )
+        )
+    parts.append("</Menu>")
+    return _encode("".join(parts))
+
+
+def parse_phonebook_rows(body: bytes) -> Iterator[Dict[str, str]]:
+    # Rows of a published document in phonebook order, in the shape of
+    # db.iter_phonebook_rows; raises ValueError for a page index.
+    try:
+        root = ET.fromstring(body)
+    except ET.ParseError as error:
+        raise ValueError(f"invalid phonebook XML: {error}") from error
+    for menu in root.iter("Menu"):
+        if menu.get("URL") is not None:
+            raise ValueError("got a page index instead of the full phonebook")
+        for unit in menu.iter("Unit"):
+            yield {
+                "group_name": menu.get("Name", ""),
+                "name": unit.get("Name", ""),
+                "telephone": unit.get("Phone1", ""),
+                "mobile": unit.get("Phone2", ""),
+                "other": unit.get("Phone3", ""),
             }
-            # Yealink expects empty strings for missing phone numbers
-            for key, value in unit_attrs.items():
-                if value is None:
-                    unit_attrs[key] = ""
-            ET.SubElement(menu_el, "Unit", **unit_attrs)
 
-    return ET.ElementTree(root)
 
+def render_link_menu(name: str, url: str) -> bytes:
+    # A <Menu> the handset fetches from URL when opened
+    return _encode(f'<Menu Name="{_escape_attrib(name)}" URL="{_escape_attrib(url)}" />')
 
-def write_phonebook_xml(
-    contacts: Iterable[Mapping],
-    output_path: Path,
+
+def render_header(*, title: str, prompt: str) -> bytes:
+    header = ["<YealinkIPPhoneBook>"]
+    header.append(f"<Title>{_escape_cdata(title)}</Title>" if title else "<Title />")
+    if prompt:
+        header.append(f"<Prompt>{_escape_cdata(prompt)}</Prompt>")
+    return XML_DECLARATION + _encode("".join(header))
+
+
+def iter_phonebook_xml(
+    groups: Iterable[Tuple[str, Iterable[Mapping]]],
     *,
     title: str,
     prompt: str,
-    default_group: str,
-) -> str:
-    sanitized_contacts = []
-    for entry in contacts:
-        updated = dict(entry)
-        updated["name"] = (entry.get("name") or "").strip()
-        group_name = (entry.get("group_name") or "").strip() or default_group
-        updated["group_name"] = group_name
-        sanitized_contacts.append(updated)
-
-    tree = contacts_to_elementtree(
-        sanitized_contacts,
-        title=title,
-        prompt=prompt,
-        default_group=default_group,
-    )
+) -> Iterator[bytes]:
+    yield render_header(title=title, prompt=prompt)
+    for group_name, entries in groups:
+        yield render_menu(group_name, entries)
+    yield XML_FOOTER
+
+
+def write_chunks(
+    chunks: Iterable[bytes],
+    output_path: Path,
+    *,
+    fsync: bool = False,
+    generation: Optional[int] = None,
+) -> int:
+    # `generation` replaces the usual increment, e.g. to mirror another node
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    tree.write(output_path, encoding="utf-8", xml_declaration=True)
-    return ET.tostring(tree.getroot(), encoding="unicode")
+    factories = _compressor_factories()
+    staged: List[_StagedFile] = []
+    size = 0
+    try:
+        for encoding, factory in factories.items():
+            staged.append(_StagedFile(compressed_variant_path(output_path, encoding), factory()))
+        # The XML goes last: anything keyed off it never sees an older sidecar.
+        staged.append(_StagedFile(output_path))
+        for chunk in chunks:
+            for staged_file in staged:
+                staged_file.write(chunk)
+            size += len(chunk)
+        for staged_file in staged:
+            staged_file.finish(fsync=fsync)
+
+        with file_lock(swap_lock_path(output_path)):
+            generation_file = _StagedFile(generation_path(output_path))
+            staged.append(generation_file)
+            if generation is None:
+                generation = read_generation(output_path) + 1
+            generation_file.write(str(generation).encode("ascii"))
+            generation_file.finish(fsync=fsync)
+            for encoding in COMPRESSED_SUFFIXES:
+                if encoding not in factories:
+                    # Do not leave a stale sidecar behind when the encoder went away
+                    compressed_variant_path(output_path, encoding).unlink(missing_ok=True)
+            for staged_file in staged:
+                os.replace(staged_file.temp_path, staged_file.final_path)
+    finally:
+        for staged_file in staged:
+            staged_file.discard()
+    if fsync:
+        _fsync_directory(output_path.parent)
+    return size
@@ -0,0 +1,396 @@
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import resource
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from flask import Flask  # noqa: E402
+
+BenchResult = Dict[str, object]
+
+_SYLLABLES = (
+    "an", "ber", "ca", "dor", "el", "fi", "gor", "ha", "in", "jo", "ka", "lu", "mar", "no",
+)
+
+
+def _name(rng: random.Random) -> str:
+    first = "".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 3))).title()
+    last = "".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4))).title()
+    return f"{first} {last}"
+
+
+def _number(rng: random.Random) -> str:
+    return "+49" + "".join(rng.choice("0123456789") for _ in range(rng.randint(8, 11)))
+
+
+def _group_weights(groups: int, distribution: str) -> List[float]:
+    if distribution == "zipf":
+        # A few large departments and a long tail of small ones
+        return [1.0 / rank for rank in range(1, groups + 1)]
+    return [1.0] * groups
+
+
+def iter_synthetic_contacts(
+    size: int,
+    *,
+    groups: int,
+    distribution: str,
+    seed: int,
+) -> Iterator[Dict[str, str]]:
+    rng = random.Random(seed)
+    group_names = [f"Group {index:03d}" for index in range(groups)]
+    weights = _group_weights(groups, distribution)
+    for _ in range(size):
+        yield {
+            "name": _name(rng),
+            "group_name": rng.choices(group_names, weights)[0],
+            "telephone": _number(rng),
+            "mobile": _number(rng) if rng.random() < 0.6 else "",
+            "other": _number(rng) if rng.random() < 0.1 else "",
+        }
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+
+    def pick(fraction: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+    return {
+        "count": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": pick(0.50) * 1000,
+        "p90_ms": pick(0.90) * 1000,
+        "p99_ms": pick(0.99) * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def _timed(function: Callable[[], object], repeat: int) -> List[float]:
+    samples: List[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def _peak_memory(function: Callable[[], object]) -> int:
+    # One extra traced run: tracemalloc slows the code down too much to be
+    # enabled while timing.
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _concurrent(request: Callable[[], int], *, clients: int, requests: int) -> Dict[str, object]:
+    statuses: Dict[str, int] = {}
+    lock = threading.Lock()
+
+    def one(_: int) -> float:
+        started = time.perf_counter()
+        status = request()
+        elapsed = time.perf_counter() - started
+        with lock:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        return elapsed
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        samples = list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - started
+    return {
+        **percentiles(samples),
+        "clients": clients,
+        "throughput_rps": requests / wall if wall else 0.0,
+        "statuses": statuses,
+    }
+
+
+def _make_app(data_dir: Path) -> Flask:
+    os.environ["DATA_DIR"] = str(data_dir)
+    # Publish inline so every seeded contact is in the feed before timing
+    os.environ.setdefault("PUBLISH_DEBOUNCE", "0")
+    from app import create_app
+
+    return create_app()
+
+
+def seed_database(app: Flask, contacts: Iterator[Dict[str, str]], batch_size: int = 5000) -> None:
+    from app.db import insert_contacts
+
+    with app.app_context():
+        batch: List[Dict[str, str]] = []
+        for contact in contacts:
+            batch.append(contact)
+            if len(batch) >= batch_size:
+                insert_contacts(batch)
+                batch.clear()
+        if batch:
+            insert_contacts(batch)
+        app.extensions["phonebook_scheduler"].flush(force=True)
+
+
+def run_in_process(app: Flask, args: argparse.Namespace) -> List[BenchResult]:
+    from app.db import fetch_contact, iter_phonebook_rows, update_contact
+    from app.xml_utils import group_ordered_rows, iter_phonebook_xml
+
+    config = app.config
+    default_group = config["DEFAULT_GROUP_NAME"]
+    publisher = app.extensions["phonebook_publisher"]
+    results: List[BenchResult] = []
+
+    def record(name: str, function: Callable[[], object]) -> None:
+        with app.app_context():
+            function()  # warm-up: statement cache, page cache, imports
+            samples = _timed(function, args.repeat)
+            peak = _peak_memory(function)
+        results.append({"benchmark": name, **percentiles(samples), "peak_memory_bytes": peak})
+
+    def read_rows() -> int:
+        return sum(1 for _ in iter_phonebook_rows(default_group))
+
+    def render_xml() -> int:
+        # What a full publish streams to disk, without the file writes
+        chunks = iter_phonebook_xml(
+            group_ordered_rows(iter_phonebook_rows(default_group)),
+            title=config["PHONEBOOK_TITLE"],
+            prompt=config["PHONEBOOK_PROMPT"],
+        )
+        return sum(len(chunk) for chunk in chunks)
+
+    def edit_and_publish() -> int:
+        # A single edit as the routes commit it; includes the UPDATE itself
+        contact = fetch_contact(1)
+        if contact is None:
+            return 0
+        telephone = "1" if contact["telephone"] != "1" else "2"
+        update_contact(
+            1,
+            contact["name"],
+            telephone,
+            contact["mobile"] or "",
+            contact["other"] or "",
+            contact["group_name"],
+        )
+        publisher.mark_changed(contact["group_name"])
+        return publisher.publish()
+
+    record("iter_phonebook_rows", read_rows)
+    record("iter_phonebook_xml", render_xml)
+    record("publish_full", lambda: publisher.publish(full=True))
+    record("publish_incremental", edit_and_publish)
+
+    client = app.test_client()
+    etag = client.get("/phonebook.xml").headers.get("ETag", "")
+    for name, headers in (
+        ("feed_200", {}),
+        ("feed_304", {"If-None-Match": etag}),
+        ("feed_gzip", {"Accept-Encoding": "gzip"}),
+    ):
+        stats = _concurrent(
+            lambda headers=headers: client.get("/phonebook.xml", headers=headers).status_code,
+            clients=args.clients,
+            requests=args.requests,
+        )
+        results.append({"benchmark": f"test_client_{name}", **stats})
+
+    record("render_index", lambda: client.get("/").status_code)
+    return results
+
+
+def _free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def _http_status(url: str, headers: Optional[Dict[str, str]] = None) -> int:
+    request = urllib.request.Request(url, headers=headers or {})
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as error:
+        return error.code
+
+
+def run_gunicorn(data_dir: Path, args: argparse.Namespace) -> List[BenchResult]:
+    port = _free_port()
+    env = {**os.environ, "DATA_DIR": str(data_dir)}
+    command = [
+        sys.executable, "-m", "gunicorn",
+        "--workers", str(args.gunicorn_workers),
+        "--bind", f"127.0.0.1:{port}",
+        "app:app",
+    ]
+    server = subprocess.Popen(
+        command,
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                if _http_status(f"{base}/phonebook.xml") == 200:
+                    break
+            except OSError:
+                pass
+            if time.monotonic() > deadline or server.poll() is not None:
+                raise RuntimeError("gunicorn did not come up")
+            time.sleep(0.2)
+        etag = ""
+        with urllib.request.urlopen(f"{base}/phonebook.xml", timeout=30) as response:
+            etag = response.headers.get("ETag", "")
+        results: List[BenchResult] = []
+        for name, path, headers in (
+            ("feed_200", "/phonebook.xml", {}),
+            ("feed_304", "/phonebook.xml", {"If-None-Match": etag}),
+            ("feed_gzip", "/phonebook.xml", {"Accept-Encoding": "gzip"}),
+            ("render_index", "/", {}),
+        ):
+            stats = _concurrent(
+                lambda path=path, headers=headers: _http_status(base + path, headers),
+                clients=args.clients,
+                requests=args.requests,
+            )
+            results.append(
+                {"benchmark": f"gunicorn_{name}", "workers": args.gunicorn_workers, **stats}
+            )
+        return results
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def compare(baseline_path: Path, results: Dict[str, object]) -> None:
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+
+    def keyed(run: Dict) -> Dict[tuple, Dict]:
+        return {(item["size"], item["benchmark"]): item for item in run["results"]}
+
+    before = keyed(baseline)
+    print(f"\n{'size':>8} {'benchmark':<32} {'p50 before':>11} {'p50 now':>9} {'change':>8}")
+    for key, item in keyed(results).items():
+        previous = before.get(key)
+        if previous is None:
+            continue
+        old, new = previous["p50_ms"], item["p50_ms"]
+        change = (new - old) / old * 100 if old else 0.0
+        print(f"{key[0]:>8} {key[1]:<32} {old:>11.2f} {new:>9.2f} {change:>+7.1f}%")
+
+
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Time publishing, feed serving and list rendering on synthetic phonebooks.",
+    )
+    parser.add_argument(
+        "--sizes", default="1000,10000,100000", help="comma-separated contact counts"
+    )
+    parser.add_argument("--groups", type=int, default=25, help="number of groups")
+    parser.add_argument("--distribution", choices=("uniform", "zipf"), default="zipf")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per in-process benchmark")
+    parser.add_argument(
+        "--clients", type=int, default=8, help="concurrent clients for feed requests"
+    )
+    parser.add_argument(
+        "--requests", type=int, default=200, help="requests per concurrent benchmark"
+    )
+    parser.add_argument("--gunicorn", action="store_true", help="also benchmark a local gunicorn")
+    parser.add_argument("--gunicorn-workers", type=int, default=2)
+    parser.add_argument("--output", type=Path, help="write results as JSON to this file")
+    parser.add_argument(
+        "--compare", type=Path, help="print p50 changes against an earlier JSON run"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = _parse_args(argv)
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    results: List[BenchResult] = []
+    for size in sizes:
+        with tempfile.TemporaryDirectory(prefix=f"yeabook-bench-{size}-") as temp_dir:
+            data_dir = Path(temp_dir)
+            app = _make_app(data_dir)
+            seed_started = time.perf_counter()
+            seed_database(
+                app,
+                iter_synthetic_contacts(
+                    size,
+                    groups=args.groups,
+                    distribution=args.distribution,
+                    seed=args.seed,
+                ),
+            )
+            seed_seconds = time.perf_counter() - seed_started
+            print(f"seeded {size} contacts in {seed_seconds:.1f}s", file=sys.stderr)
+            size_results = run_in_process(app, args)
+            app.extensions["sqlite_pool"].close_all()
+            if args.gunicorn:
+                if importlib.util.find_spec("gunicorn") is None:
+                    print("gunicorn is not installed; skipping", file=sys.stderr)
+                else:
+                    size_results.extend(run_gunicorn(data_dir, args))
+            for item in size_results:
+                item["size"] = size
+                print(
+                    f"{size:>8} {item['benchmark']:<32} p50 {item['p50_ms']:>9.2f} ms"
+                    f"  p99 {item['p99_ms']:>9.2f} ms",
+                    file=sys.stderr,
+                )
+            results.extend(size_results)
+
+    run: Dict[str, object] = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "arguments": {key: str(value) for key, value in vars(args).items()},
+            # ru_maxrss is KiB on Linux and bytes on macOS
+            "max_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        },
+        "results": results,
+    }
+    payload = json.dumps(run, indent=2)
+    if args.output:
+        args.output.write_text(payload + "\n", encoding="utf-8")
+    else:
+        print(payload)
+    if args.compare:
+        compare(args.compare, run)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+import os
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+# app/__init__.py builds an app at import time; keep it out of the checkout
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="yeabook-tests-"))
+
+from app import create_app  # noqa: E402
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+    monkeypatch.setenv("PUBLISH_DEBOUNCE", "0")
+    monkeypatch.setenv("METRICS_DIR", "")
+    return tmp_path
+
+
+@pytest.fixture
+def make_app(data_dir):
+    return create_app
+
+
+@pytest.fixture
+def serve():
+    # Starts a local stand-in for a remote HTTP service; returns its base URL
+    servers = []
+
+    def start(handler_class):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler_class)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,28 @@
+import json
+
+from benchmarks import phonebook_bench
+
+
+def test_benchmark_times_the_publish_and_feed_paths(data_dir):
+    output = data_dir / "bench.json"
+
+    exit_code = phonebook_bench.main(
+        ["--sizes", "30", "--repeat", "1", "--requests", "2", "--clients", "1"]
+        + ["--output", str(output)]
+    )
+
+    assert exit_code == 0
+    run = json.loads(output.read_text(encoding="utf-8"))
+    assert [item["benchmark"] for item in run["results"]] == [
+        "iter_phonebook_rows",
+        "iter_phonebook_xml",
+        "publish_full",
+        "publish_incremental",
+        "test_client_feed_200",
+        "test_client_feed_304",
+        "test_client_feed_gzip",
+        "render_index",
+    ]
+    statuses = {item["benchmark"]: item.get("statuses") for item in run["results"]}
+    assert statuses["test_client_feed_304"] == {"304": 2}
+    assert all(item["size"] == 30 and item["p50_ms"] >= 0 for item in run["results"])
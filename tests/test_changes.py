@@ -0,0 +1,50 @@
+import sqlite3
+
+
+def _create_baseline_database(path):
+    # The schema before generation tracking and the change journal existed
+    db = sqlite3.connect(path)
+    db.execute(
+        """
+        CREATE TABLE contacts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            telephone TEXT,
+            mobile TEXT,
+            other TEXT,
+            group_name TEXT NOT NULL DEFAULT 'Contacts'
+        )
+        """
+    )
+    db.executemany(
+        "INSERT INTO contacts (name, telephone, group_name) VALUES (?, ?, ?)",
+        [("Alice", "100", "Staff"), ("Bob", "200", "Sales"), ("Carol", "300", "Staff")],
+    )
+    db.commit()
+    db.close()
+
+
+def test_changes_since_zero_returns_contacts_of_upgraded_database(data_dir, make_app):
+    _create_baseline_database(data_dir / "contacts.db")
+    client = make_app().test_client()
+
+    body = client.get("/changes?since=0").get_json()
+
+    assert body["full"] is True
+    assert sorted(contact["name"] for contact in body["contacts"]) == ["Alice", "Bob", "Carol"]
+
+    client.post("/contacts", data={"name": "Dave", "telephone": "400", "group_name": "Staff"})
+    delta = client.get(f"/changes?since={body['generation']}").get_json()
+    assert delta["full"] is False
+    assert [change["name"] for change in delta["changes"]] == ["Dave"]
+
+
+def test_changes_since_zero_on_new_database_is_a_delta(make_app):
+    client = make_app().test_client()
+    client.post("/contacts", data={"name": "Alice", "telephone": "100"})
+
+    body = client.get("/changes?since=0").get_json()
+
+    assert body["full"] is False
+    assert [change["name"] for change in body["changes"]] == ["Alice"]
+
@@ -0,0 +1,95 @@
+import sqlite3
+
+import pytest
+
+from app import db
+from app.db import pragma_statements
+from app.pool import ConnectionPool
+
+
+def test_connections_use_the_configured_pragma_profile(make_app, monkeypatch):
+    monkeypatch.setenv("SQLITE_SYNCHRONOUS", "FULL")
+    monkeypatch.setenv("SQLITE_BUSY_TIMEOUT", "1234")
+    client = make_app().test_client()
+
+    database = client.get("/status.json").get_json()["database"]
+
+    assert database["journal_mode"] == "wal"
+    assert database["synchronous"] == "full"
+    assert database["busy_timeout"] == 1234
+    assert database["temp_store"] == "memory"
+
+
+def test_pragma_values_are_validated_before_use():
+    with pytest.raises(ValueError):
+        pragma_statements({"SQLITE_JOURNAL_MODE": "wal; DROP TABLE contacts"})
+    with pytest.raises(ValueError):
+        pragma_statements({"SQLITE_CACHE_SIZE": "-2000 OR 1"})
+    assert pragma_statements({"SQLITE_SYNCHRONOUS": " Normal ", "SQLITE_MMAP_SIZE": ""}) == [
+        "PRAGMA synchronous = normal"
+    ]
+
+
+def test_pool_reuses_connections_up_to_its_size(tmp_path):
+    pool = ConnectionPool(tmp_path / "pool.db", size=1, pragmas=["PRAGMA busy_timeout = 50"])
+    first = pool.acquire()
+    first.execute("CREATE TABLE items (value INTEGER)")
+    first.commit()
+    first.execute("INSERT INTO items VALUES (1)")
+    second = pool.acquire()
+
+    assert second is not first
+    pool.release(first)
+    pool.release(second)
+
+    reused = pool.acquire()
+    assert reused is first
+    # Released mid-transaction: the insert was rolled back, not left open
+    assert not reused.in_transaction
+    assert reused.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 0
+    assert reused.execute("PRAGMA busy_timeout").fetchone()[0] == 50
+    # The connection beyond the pool size was closed on release
+    with pytest.raises(sqlite3.ProgrammingError):
+        second.execute("SELECT 1")
+
+    reused.close()
+    pool.release(reused)
+    replacement = pool.acquire()
+    assert replacement is not reused
+    assert replacement.execute("SELECT 1").fetchone()[0] == 1
+    pool.release(replacement)
+    pool.close_all()
+
+
+def test_startup_runs_only_the_schema_steps_a_database_has_not_seen(
+    data_dir, make_app, monkeypatch
+):
+    # A database from before contacts had groups, at user_version 0
+    database = sqlite3.connect(data_dir / "contacts.db")
+    database.execute(
+        "CREATE TABLE contacts (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, "
+        "telephone TEXT, mobile TEXT, other TEXT)"
+    )
+    database.execute("INSERT INTO contacts (name, telephone) VALUES ('Ann', '100')")
+    database.commit()
+    database.close()
+
+    make_app()
+
+    database = sqlite3.connect(data_dir / "contacts.db")
+    assert database.execute("PRAGMA user_version").fetchone()[0] == db.SCHEMA_VERSION
+    columns = {row[1] for row in database.execute("PRAGMA table_info(contacts)")}
+    assert "group_name" in columns
+    tables = {row[0] for row in database.execute("SELECT name FROM sqlite_master")}
+    assert {"meta", "contact_changes", "contact_numbers"} <= tables
+    database.close()
+
+    ran = []
+    monkeypatch.setattr(
+        db,
+        "_MIGRATIONS",
+        tuple(lambda connection, step=step: ran.append(step) for step in db._MIGRATIONS),
+    )
+    client = make_app().test_client()
+    assert ran == []
+    assert "Ann" in client.get("/").get_data(as_text=True)
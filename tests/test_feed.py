@@ -0,0 +1,157 @@
+import gzip
+import io
+from xml.etree import ElementTree as ET
+
+import pytest
+
+from app.xml_utils import (
+    compressed_variant_path,
+    iter_phonebook_xml,
+    read_generation,
+    write_chunks,
+)
+
+
+def _add(client, name, group_name="", telephone="100"):
+    client.post("/contacts", data={"name": name, "telephone": telephone, "group_name": group_name})
+
+
+def _menus(body):
+    return [
+        (menu.get("Name"), [unit.get("Name") for unit in menu.iter("Unit")])
+        for menu in ET.fromstring(body).iter("Menu")
+    ]
+
+
+def test_feed_answers_304_until_the_book_changes(make_app):
+    client = make_app().test_client()
+    _add(client, "Alice")
+
+    first = client.get("/phonebook.xml")
+    etag = first.headers["ETag"]
+    again = client.get("/phonebook.xml", headers={"If-None-Match": etag})
+
+    assert first.status_code == 200 and b'Name="Alice"' in first.data
+    assert again.status_code == 304 and again.data == b""
+    assert again.headers["ETag"] == etag
+
+    _add(client, "Bob")
+    changed = client.get("/phonebook.xml", headers={"If-None-Match": etag})
+
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert b'Name="Bob"' in changed.data
+
+
+def test_feed_negotiates_gzip_with_its_own_etag(make_app):
+    client = make_app().test_client()
+    _add(client, "Alice")
+    plain = client.get("/phonebook.xml")
+
+    compressed = client.get("/phonebook.xml", headers={"Accept-Encoding": "gzip"})
+
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in compressed.headers["Vary"]
+    assert gzip.decompress(compressed.data) == plain.data
+    assert compressed.headers["ETag"] not in (plain.headers["ETag"], "")
+    revalidated = client.get(
+        "/phonebook.xml",
+        headers={"Accept-Encoding": "gzip", "If-None-Match": compressed.headers["ETag"]},
+    )
+    assert revalidated.status_code == 304
+    assert "Content-Encoding" not in client.get("/phonebook.xml").headers
+
+
+def test_streamed_xml_matches_elementtree_output():
+    rows = [
+        {"name": 'Ann & "Co" <x>', "telephone": "1", "mobile": "", "other": None},
+        {"name": "Zoë\tTab\nLine", "telephone": " 2 ", "mobile": "3", "other": "4"},
+    ]
+    root = ET.Element("YealinkIPPhoneBook")
+    ET.SubElement(root, "Title").text = "Book & <Co>"
+    ET.SubElement(root, "Prompt").text = "Pick"
+    menu = ET.SubElement(root, "Menu", Name="Sales & Support")
+    for row in rows:
+        ET.SubElement(
+            menu,
+            "Unit",
+            Name=(row["name"] or "").strip(),
+            Phone1=(row["telephone"] or "").strip(),
+            Phone2=(row["mobile"] or "").strip(),
+            Phone3=(row["other"] or "").strip(),
+            default_photo="Resource:",
+        )
+    expected = io.BytesIO()
+    ET.ElementTree(root).write(expected, encoding="utf-8", xml_declaration=True)
+
+    streamed = b"".join(
+        iter_phonebook_xml([("Sales & Support", iter(rows))], title="Book & <Co>", prompt="Pick")
+    )
+
+    assert streamed == expected.getvalue()
+
+
+def test_feed_is_grouped_and_ordered_case_insensitively(make_app):
+    client = make_app().test_client()
+    for name, group_name in (
+        ("bob", "beta"),
+        ("Alice", "beta"),
+        ("Carl", ""),
+        ("anna", "Alpha"),
+        ("Dora", "Zulu"),
+        ("Ben", "beta"),
+    ):
+        _add(client, name, group_name)
+
+    assert _menus(client.get("/phonebook.xml").data) == [
+        ("Alpha", ["anna"]),
+        ("beta", ["Alice", "Ben", "bob"]),
+        ("Contacts", ["Carl"]),
+        ("Zulu", ["Dora"]),
+    ]
+
+
+def test_failed_publish_leaves_the_previous_files_in_place(tmp_path):
+    xml_path = tmp_path / "phonebook.xml"
+    write_chunks([b"<old />"], xml_path)
+
+    def chunks():
+        yield b"<new>"
+        raise RuntimeError("render failed")
+
+    with pytest.raises(RuntimeError):
+        write_chunks(chunks(), xml_path)
+
+    assert xml_path.read_bytes() == b"<old />"
+    assert gzip.decompress(compressed_variant_path(xml_path, "gzip").read_bytes()) == b"<old />"
+    assert read_generation(xml_path) == 1
+    assert not list(tmp_path.glob(".*.tmp"))
+
+    write_chunks([b"<new />"], xml_path)
+
+    assert xml_path.read_bytes() == b"<new />"
+    assert gzip.decompress(compressed_variant_path(xml_path, "gzip").read_bytes()) == b"<new />"
+    assert read_generation(xml_path) == 2
+
+
+def test_group_feeds_serve_only_the_requested_groups(make_app):
+    client = make_app().test_client()
+    for name, group_name in (("Ann", "Sales"), ("Bob", "Staff"), ("Cid", "Support")):
+        _add(client, name, group_name)
+
+    assert _menus(client.get("/phonebook/Staff.xml").data) == [("Staff", ["Bob"])]
+    assert _menus(client.get("/phonebook/staff.xml").data) == [("Staff", ["Bob"])]
+    assert _menus(client.get("/phonebook.xml?groups=Support,Sales").data) == [
+        ("Sales", ["Ann"]),
+        ("Support", ["Cid"]),
+    ]
+    assert client.get("/phonebook/Nobody.xml").status_code == 404
+
+    cached = client.get("/phonebook/Staff.xml")
+    etag = cached.headers["ETag"]
+    assert client.get("/phonebook/Staff.xml", headers={"If-None-Match": etag}).status_code == 304
+
+    _add(client, "Dee", "Staff")
+    changed = client.get("/phonebook/Staff.xml", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert _menus(changed.data) == [("Staff", ["Bob", "Dee"])]
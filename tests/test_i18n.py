@@ -0,0 +1,16 @@
+import pytest
+
+from app.i18n import FrozenStrings
+
+
+def test_frozen_strings_keys_do_not_hide_mapping_methods():
+    strings = FrozenStrings({"get": "Fetch", "items": "Entries", "title": "Directory"})
+
+    assert strings["get"] == "Fetch"
+    assert strings.title == "Directory"
+    assert strings.get("items") == "Entries"
+    assert dict(strings.items()) == {"get": "Fetch", "items": "Entries", "title": "Directory"}
+    with pytest.raises(AttributeError):
+        strings.missing
+    with pytest.raises(AttributeError):
+        strings.title = "Changed"
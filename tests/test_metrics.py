@@ -0,0 +1,45 @@
+import gc
+import os
+import threading
+
+from app import metrics
+
+
+def _record_in_threads(count):
+    threads = [
+        threading.Thread(target=metrics.HTTP_REQUESTS.inc, kwargs={"endpoint": "test.threads"})
+        for _ in range(count)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    gc.collect()
+
+
+def _requests_counted():
+    key = ("yeabook_http_requests_total", ("test.threads", "", ""))
+    return metrics.collect_local().get(key, 0.0)
+
+
+def test_finished_threads_keep_their_counts_but_not_their_stores():
+    before = _requests_counted()
+    _record_in_threads(50)
+    stores = sum(1 for pid, _ in metrics._STORES if pid == os.getpid())
+
+    _record_in_threads(50)
+
+    assert _requests_counted() == before + 100
+    assert sum(1 for pid, _ in metrics._STORES if pid == os.getpid()) <= stores
+
+
+def test_collect_folds_files_of_exited_workers_into_one_total(tmp_path):
+    exporter = metrics.MultiprocessExporter(tmp_path, interval=60)
+    # Counted by no live thread, so only the files contribute
+    key = ("yeabook_http_requests_total", ("test.exited", "GET", "200"))
+    metrics._write_samples(tmp_path / "999999999.json", {key: 5.0})
+    metrics._write_samples(tmp_path / "999999998.json", {key: 3.0})
+
+    assert exporter.collect()[key] == 8.0
+    assert sorted(path.name for path in tmp_path.glob("*.json")) == ["retired.json"]
+    assert exporter.collect()[key] == 8.0
@@ -0,0 +1,160 @@
+from app import paging
+from app.cache import LRUCache
+from app.paging import manifest_path, page_path, plan_pages
+
+
+_NUMBERS = {"telephone": "1", "mobile": "", "other": ""}
+
+
+def _pages(xml_path):
+    pages = []
+    number = 1
+    while page_path(xml_path, number).exists():
+        pages.append(page_path(xml_path, number).read_bytes())
+        number += 1
+    return pages
+
+
+def test_plan_pages_keeps_groups_together_and_cuts_oversized_ones():
+    layouts = plan_pages([("A", 2), ("B", 2), ("C", 7)], 4)
+
+    assert layouts == [
+        (("A", 0, 2, 2), ("B", 0, 2, 2)),
+        (("C", 0, 4, 7),),
+        (("C", 4, 3, 7),),
+    ]
+
+
+def test_single_edit_rerenders_only_the_pages_it_touches(data_dir, make_app, monkeypatch):
+    monkeypatch.setenv("PHONEBOOK_PAGE_SIZE", "3")
+    app = make_app()
+    client = app.test_client()
+    for group in "ABCD":
+        for index in range(3):
+            client.post(
+                "/contacts",
+                data={"name": f"{group}{index}", "telephone": "1", "group_name": group},
+            )
+    xml_path = data_dir / "phonebook.xml"
+    manifest = manifest_path(xml_path).stat().st_mtime_ns
+    rendered = []
+    original = paging.iter_phonebook_xml
+
+    def counting(menus, **kwargs):
+        rendered.append([group for group, _ in menus])
+        return original(menus, **kwargs)
+
+    monkeypatch.setattr(paging, "iter_phonebook_xml", counting)
+    contact = client.get("/api/contacts?q=C1").get_json()["contacts"][0]
+    client.patch(f"/api/contacts/{contact['id']}", json={"telephone": "2"})
+
+    assert rendered == [["C"]]
+    assert manifest_path(xml_path).stat().st_mtime_ns == manifest
+    incremental = _pages(xml_path)
+    with app.app_context():
+        app.extensions["phonebook_publisher"].publish(full=True)
+    assert _pages(xml_path) == incremental
+
+
+def test_incremental_pages_match_a_full_rebuild_when_cuts_move(data_dir, make_app, monkeypatch):
+    monkeypatch.setenv("PHONEBOOK_PAGE_SIZE", "3")
+    app = make_app()
+    client = app.test_client()
+    for group in "ABC":
+        for index in range(2):
+            client.post(
+                "/contacts",
+                data={"name": f"{group}{index}", "telephone": "1", "group_name": group},
+            )
+    client.post("/contacts", data={"name": "A9", "telephone": "1", "group_name": "A"})
+    contact = client.get("/api/contacts?q=B0").get_json()["contacts"][0]
+    client.patch(f"/api/contacts/{contact['id']}", json={"group_name": "C"})
+    xml_path = data_dir / "phonebook.xml"
+    incremental = _pages(xml_path)
+    labels = manifest_path(xml_path).read_text()
+
+    with app.app_context():
+        app.extensions["phonebook_publisher"].publish(full=True)
+
+    assert _pages(xml_path) == incremental
+    assert manifest_path(xml_path).read_text() == labels
+
+
+def test_page_labels_name_the_range_of_cut_groups():
+    def rows(*names):
+        return [{"name": name} for name in names]
+
+    assert paging.page_label([("Sales", rows("Ann", "Bob"))], [False]) == "Sales"
+    assert paging.page_label([("Sales", rows("Martin", "Moritz"))], [True]) == "Sales (Ma–Mo)"
+    assert paging.page_label([("Sales", rows("Mark", "Martha"))], [True]) == "Sales (Mark–Mart)"
+    assert (
+        paging.page_label([("Sales", rows("Yara", "Zoe")), ("Support", rows("Al"))], [True, False])
+        == "Sales (Ya–Zo) – Support"
+    )
+    assert (
+        paging.page_label([("A", rows("Al")), ("B", rows("Bea", "Bob"))], [False, True])
+        == "A – B (Be–Bo)"
+    )
+
+
+def test_write_pages_fetches_one_page_of_rows_at_a_time(tmp_path):
+    requested = []
+
+    def group_rows(group_name, offset, count):
+        requested.append((group_name, offset, count))
+        return [
+            {"name": f"{group_name}{offset + index:02d}", **_NUMBERS}
+            for index in range(count)
+        ]
+
+    pages = paging.write_pages(
+        [("A", 2), ("B", 7)],
+        group_rows,
+        tmp_path / "phonebook.xml",
+        page_size=4,
+        title="Directory",
+        prompt="Select",
+    )
+
+    assert requested == [("A", 0, 2), ("B", 0, 4), ("B", 4, 3)]
+    assert pages.labels == ["A", "B (B00–B03)", "B (B04–B06)"]
+
+
+def test_page_index_is_cached_per_tenant_and_host(tmp_path):
+    books = []
+    for tenant in ("a", "b"):
+        xml_path = tmp_path / tenant / "phonebook.xml"
+        xml_path.parent.mkdir()
+        paging.write_pages(
+            [("A", 2), ("B", 2)],
+            lambda group_name, offset, count: [
+                {"name": f"{group_name}{index}", **_NUMBERS} for index in range(count)
+            ],
+            xml_path,
+            page_size=2,
+            title="Directory",
+            prompt="Select",
+        )
+        books.append((xml_path, LRUCache(2)))
+
+    def index(book, host):
+        xml_path, cache = book
+        return paging.get_page_index(
+            xml_path,
+            host,
+            lambda number: f"{host}pages/{number}.xml",
+            cache=cache,
+            generation=1,
+            title="Directory",
+            prompt="Select",
+        )
+
+    first = index(books[0], "http://pbx/")
+    for number in range(20):
+        index(books[1], f"http://host{number}/")
+
+    assert index(books[0], "http://pbx/") is first
+    assert b"http://pbx/pages/2.xml" in first.body
+    index(books[0], "http://other/")
+    index(books[0], "http://third/")
+    assert index(books[0], "http://pbx/") is not first
@@ -0,0 +1,116 @@
+import json
+import time
+
+from app.publisher import PhonebookPublisher
+
+
+def test_incremental_publish_matches_a_full_rebuild(data_dir, make_app, monkeypatch):
+    app = make_app()
+    client = app.test_client()
+    xml_path = data_dir / "phonebook.xml"
+    for name, group_name in (("Ann", "Sales"), ("Bob", "Staff"), ("Cid", "Staff")):
+        client.post(
+            "/api/contacts", json={"name": name, "telephone": "1", "group_name": group_name}
+        )
+    full_renders = []
+    render_full = PhonebookPublisher._render_full
+    monkeypatch.setattr(
+        PhonebookPublisher,
+        "_render_full",
+        staticmethod(lambda *args: full_renders.append(args) or render_full(*args)),
+    )
+    publisher = app.extensions["phonebook_publisher"]
+
+    def assert_matches_full():
+        incremental = xml_path.read_bytes()
+        with app.app_context():
+            publisher.publish(full=True)
+        assert xml_path.read_bytes() == incremental
+        full_renders.clear()
+
+    created = client.post(
+        "/api/contacts", json={"name": "Dee", "telephone": "2", "group_name": "Support"}
+    ).get_json()
+    assert not full_renders
+    assert_matches_full()
+
+    client.patch(f"/api/contacts/{created['id']}", json={"group_name": "Sales"})
+    assert not full_renders
+    assert_matches_full()
+
+    client.delete("/api/contacts/1")
+    assert not full_renders
+    assert_matches_full()
+    assert b'Name="Ann"' not in xml_path.read_bytes()
+
+
+def _count_publishes(app, monkeypatch):
+    publisher = app.extensions["phonebook_publisher"]
+    published = []
+    publish = publisher.publish
+    monkeypatch.setattr(
+        publisher, "publish", lambda **kwargs: published.append(kwargs) or publish(**kwargs)
+    )
+    return published
+
+
+def test_scheduler_coalesces_a_burst_into_one_publish(make_app, monkeypatch):
+    monkeypatch.setenv("PUBLISH_DEBOUNCE", "0.2")
+    app = make_app()
+    client = app.test_client()
+    published = _count_publishes(app, monkeypatch)
+
+    for index in range(5):
+        client.post("/contacts", data={"name": f"Contact {index}", "telephone": "1"})
+    assert published == []
+
+    deadline = time.monotonic() + 5
+    while not published and time.monotonic() < deadline:
+        time.sleep(0.05)
+    time.sleep(0.3)
+
+    assert len(published) == 1
+    assert client.get("/phonebook.xml").data.count(b"<Unit ") == 5
+
+
+def test_scheduler_flush_publishes_pending_edits(make_app, monkeypatch):
+    monkeypatch.setenv("PUBLISH_DEBOUNCE", "60")
+    app = make_app()
+    client = app.test_client()
+    published = _count_publishes(app, monkeypatch)
+    client.post("/contacts", data={"name": "Ann", "telephone": "1"})
+    scheduler = app.extensions["phonebook_scheduler"]
+
+    assert published == []
+    scheduler.flush()
+    assert len(published) == 1
+    assert b'Name="Ann"' in client.get("/phonebook.xml").data
+    scheduler.flush()
+    assert len(published) == 1
+    scheduler.close()
+
+
+def test_startup_skips_the_publish_when_the_stamp_matches(data_dir, make_app, monkeypatch):
+    client = make_app().test_client()
+    client.post("/contacts", data={"name": "Ann", "telephone": "1"})
+    published = []
+    publish = PhonebookPublisher.publish
+    monkeypatch.setattr(
+        PhonebookPublisher,
+        "publish",
+        lambda self, **kwargs: published.append(kwargs) or publish(self, **kwargs),
+    )
+
+    make_app()
+    assert published == []
+    assert json.loads((data_dir / "phonebook.xml.source").read_text())["generation"] == 1
+
+    # A setting the XML depends on changed: publish again
+    monkeypatch.setenv("PHONEBOOK_TITLE", "Renamed")
+    make_app()
+    assert len(published) == 1
+    assert b"<Title>Renamed</Title>" in (data_dir / "phonebook.xml").read_bytes()
+
+    (data_dir / "phonebook.xml").unlink()
+    make_app()
+    assert len(published) == 2
@@ -0,0 +1,140 @@
+import gzip
+import hashlib
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+from app.paging import page_path, render_page_index
+from app.replica import ReplicaSource, feed_url, sync_replica
+from app.xml_utils import (
+    iter_phonebook_xml,
+    parse_phonebook_rows,
+    read_generation,
+    write_chunks,
+)
+
+_ROW = {"group_name": "Staff", "name": "Ann", "telephone": "1", "mobile": "", "other": ""}
+
+
+def test_parse_phonebook_rows_reads_back_a_published_document():
+    rows = [
+        {"group_name": "Sales", "name": "Ann & Co", "telephone": "1", "mobile": "", "other": ""},
+        {"group_name": "Staff", "name": 'Bob "B"', "telephone": "2", "mobile": "3", "other": "4"},
+    ]
+    body = b"".join(
+        iter_phonebook_xml(
+            [(row["group_name"], [row]) for row in rows], title="Book", prompt="Pick"
+        )
+    )
+
+    assert list(parse_phonebook_rows(body)) == rows
+
+
+def test_parse_phonebook_rows_refuses_a_page_index():
+    body = render_page_index(
+        ["A – M"], ["http://primary/phonebook/pages/1.xml"], title="", prompt=""
+    )
+
+    with pytest.raises(ValueError):
+        list(parse_phonebook_rows(body))
+
+
+def test_replica_serves_tenant_feeds_and_refuses_their_writes(data_dir, make_app, monkeypatch):
+    tenant_dir = data_dir / "tenants" / "acme"
+    tenant_dir.mkdir(parents=True)
+    # A replica does not publish; the tenant's feed is put there by other means
+    write_chunks(
+        iter_phonebook_xml([("Staff", [_ROW])], title="Acme", prompt=""),
+        tenant_dir / "phonebook.xml",
+    )
+    # Nothing listens on the discard port; the sync fails without waiting
+    monkeypatch.setenv("REPLICA_OF", "http://127.0.0.1:9")
+    monkeypatch.setenv("REPLICA_INTERVAL", "3600")
+    client = make_app().test_client()
+
+    assert b"Ann" in client.get("/t/acme/phonebook.xml").data
+    assert client.get("/t/acme/replica.json").status_code == 200
+    assert client.post("/t/acme/contacts", data={"name": "Ann"}).status_code == 403
+    assert client.get("/t/acme/").headers["Location"] == "http://127.0.0.1:9/t/acme/"
+
+
+def _feed(*names):
+    rows = [dict(_ROW, name=name) for name in names]
+    return b"".join(iter_phonebook_xml([("Staff", rows)], title="Primary", prompt=""))
+
+
+class _Primary(BaseHTTPRequestHandler):
+    # Serves one book the way /phonebook.xml does: ETag, 304 and gzip
+    body = b""
+    generation = 1
+    failing = False
+    requests = []
+
+    def do_GET(self):
+        type(self).requests.append((self.path, self.headers.get("If-None-Match")))
+        if type(self).failing:
+            self.send_error(503)
+            return
+        etag = '"%s"' % hashlib.sha256(type(self).body).hexdigest()[:16]
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        body = gzip.compress(type(self).body)
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("X-Phonebook-Generation", str(type(self).generation))
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_sync_replica_mirrors_the_primary_feed(serve, tmp_path):
+    _Primary.body, _Primary.generation, _Primary.failing = _feed("Ann", "Bob"), 7, False
+    _Primary.requests = []
+    source = ReplicaSource(
+        feed_url=feed_url(serve(_Primary)),
+        xml_path=tmp_path / "phonebook.xml",
+        state_path=tmp_path / "replica_state.json",
+        interval=30,
+        timeout=5,
+        fsync=False,
+        page_size=1,
+        title="Replica",
+        prompt="",
+    )
+
+    first = sync_replica(source, force=True)
+
+    assert _Primary.requests == [("/phonebook.xml?full=1", None)]
+    assert source.xml_path.read_bytes() == _Primary.body
+    assert read_generation(source.xml_path) == 7
+    assert first["error"] is None and first["primary_generation"] == 7
+    # Cut into local pages of one contact each
+    assert b'Name="Bob"' in page_path(source.xml_path, 2).read_bytes()
+
+    unchanged = sync_replica(source, force=True)
+
+    assert _Primary.requests[1] == ("/phonebook.xml?full=1", first["etag"])
+    assert unchanged["last_change"] == first["last_change"]
+    assert read_generation(source.xml_path) == 7
+
+    _Primary.body, _Primary.generation = _feed("Ann", "Bob", "Cid"), 8
+    changed = sync_replica(source, force=True)
+
+    assert source.xml_path.read_bytes() == _Primary.body
+    assert read_generation(source.xml_path) == 8
+    assert changed["etag"] != first["etag"]
+    assert b'Name="Cid"' in page_path(source.xml_path, 3).read_bytes()
+
+    _Primary.failing = True
+    failed = sync_replica(source, force=True)
+
+    assert "503" in failed["error"]
+    assert source.xml_path.read_bytes() == _Primary.body
+    assert failed["last_sync"] == changed["last_sync"]
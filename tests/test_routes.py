@@ -0,0 +1,202 @@
+import base64
+
+from app import routes
+
+
+def test_row_urls_survive_digits_in_the_tenant_name(data_dir, make_app):
+    (data_dir / "tenants" / "t918273645").mkdir(parents=True)
+    client = make_app().test_client()
+    client.post("/t/t918273645/contacts", data={"name": "Ann", "telephone": "1"})
+
+    html = client.get("/t/t918273645/").get_data(as_text=True)
+
+    assert 'href="/t/t918273645/?edit=1"' in html
+    assert 'action="/t/t918273645/contacts/1/delete"' in html
+
+
+def _create(client, name, group_name="", telephone="100"):
+    response = client.post(
+        "/api/contacts", json={"name": name, "telephone": telephone, "group_name": group_name}
+    )
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()
+
+
+def test_contact_pages_walk_the_book_with_keyset_cursors(make_app):
+    client = make_app().test_client()
+    for index, group_name in enumerate(["Staff", "sales", "", "Staff", "Sales", "staff", ""]):
+        _create(client, f"Name {index}", group_name, telephone=f"0170{index}")
+    expected = [
+        (contact["group_name"], contact["name"])
+        for contact in client.get("/api/contacts?limit=100").get_json()["contacts"]
+    ]
+
+    seen = []
+    url = "/api/contacts?limit=2"
+    while url:
+        body = client.get(url).get_json()
+        assert len(body["contacts"]) <= 2 and body["total"] == 7
+        seen.extend((contact["group_name"], contact["name"]) for contact in body["contacts"])
+        url = f"/api/contacts?limit=2&after={body['next']}" if body["next"] else None
+
+    assert seen == expected
+    assert len(set(seen)) == 7
+
+
+def test_contact_search_matches_names_groups_and_number_prefixes(make_app):
+    client = make_app().test_client()
+    _create(client, "Alice Smith", "Sales", telephone="+49301234")
+    _create(client, "Bob Jones", "Support", telephone="0170555")
+    _create(client, "Carol Smithers", "Staff", telephone="0170999")
+
+    def names(query):
+        body = client.get("/api/contacts", query_string={"q": query}).get_json()
+        assert body["total"] == len(body["contacts"])
+        return sorted(contact["name"] for contact in body["contacts"])
+
+    assert names("smith") == ["Alice Smith", "Carol Smithers"]
+    assert names("supp") == ["Bob Jones"]
+    assert names("0170") == ["Bob Jones", "Carol Smithers"]
+    assert names("nobody") == []
+
+
+def test_bad_cursors_start_from_the_first_page(make_app):
+    client = make_app().test_client()
+    for name in ("Ann", "Bob", "Cid"):
+        _create(client, name)
+    first = client.get("/api/contacts?limit=2").get_json()["contacts"]
+
+    for cursor in (
+        "garbage",
+        "%%%",
+        base64.urlsafe_b64encode(b'{"group": 1}').decode(),
+        base64.urlsafe_b64encode(b'["Contacts", "Ann", "x"]').decode(),
+        base64.urlsafe_b64encode(b"42").decode(),
+    ):
+        response = client.get("/api/contacts", query_string={"limit": 2, "after": cursor})
+        assert response.status_code == 200
+        assert response.get_json()["contacts"] == first
+        assert client.get("/", query_string={"after": cursor}).status_code == 200
+
+
+def test_lookup_finds_exact_numbers_in_any_presentation(make_app, monkeypatch):
+    monkeypatch.setenv("LOOKUP_COUNTRY_CODE", "+49")
+    client = make_app().test_client()
+    _create(client, "Alice", "Sales", telephone="+49301234567")
+    _create(client, "Bob", "Staff", telephone="0170555123")
+
+    for number in ("+49301234567", "0049301234567", "030 1234567"):
+        body = client.get("/lookup", query_string={"number": number}).get_json()
+        assert body["match"] == "exact"
+        assert [(match["name"], match["field"]) for match in body["contacts"]] == [
+            ("Alice", "telephone")
+        ]
+    body = client.get("/lookup", query_string={"number": "+49170555123"}).get_json()
+    assert [match["name"] for match in body["contacts"]] == ["Bob"]
+
+
+def test_lookup_falls_back_to_a_suffix_match(make_app, monkeypatch):
+    monkeypatch.setenv("LOOKUP_SUFFIX_DIGITS", "6")
+    client = make_app().test_client()
+    _create(client, "Alice", telephone="+49301234567")
+
+    suffix = client.get("/lookup?number=991234567")
+    assert suffix.status_code == 200
+    assert suffix.get_json()["match"] == "suffix"
+    assert [match["name"] for match in suffix.get_json()["contacts"]] == ["Alice"]
+
+    missing = client.get("/lookup?number=7654321")
+    assert missing.status_code == 404 and missing.get_json()["match"] is None
+    assert client.get("/lookup?number=").status_code == 400
+    # Cached per generation: a new contact is found right away
+    _create(client, "Bob", telephone="7654321")
+    assert client.get("/lookup?number=7654321").get_json()["match"] == "exact"
+
+
+def _names(client):
+    return sorted(contact["name"] for contact in client.get("/api/contacts").get_json()["contacts"])
+
+
+def test_batch_with_an_invalid_item_applies_nothing(make_app):
+    client = make_app().test_client()
+    ann = _create(client, "Ann")
+    feed = client.get("/phonebook.xml").data
+
+    response = client.post(
+        "/api/contacts:batch",
+        json={
+            "operations": [
+                {"op": "create", "contact": {"name": "Bob", "telephone": "200"}},
+                {"op": "update", "id": ann["id"], "contact": {"name": "Anna"}},
+                {"op": "create", "contact": {"name": "", "telephone": "300"}},
+            ]
+        },
+    )
+
+    assert response.status_code == 422
+    body = response.get_json()
+    assert body["applied"] is False
+    assert [bool(result.get("errors")) for result in body["results"]] == [False, False, True]
+    assert _names(client) == ["Ann"]
+    assert client.get("/phonebook.xml").data == feed
+
+
+def test_batch_with_a_missing_contact_is_rolled_back(make_app):
+    client = make_app().test_client()
+    ann = _create(client, "Ann")
+
+    response = client.post(
+        "/api/contacts:batch",
+        json={
+            "operations": [
+                {"op": "create", "contact": {"name": "Bob", "telephone": "200"}},
+                {"op": "delete", "id": ann["id"]},
+                {"op": "delete", "id": 999},
+            ]
+        },
+    )
+
+    assert response.status_code == 422
+    assert response.get_json()["results"][2]["errors"] == {"id": "contact not found"}
+    assert _names(client) == ["Ann"]
+
+    applied = client.post(
+        "/api/contacts:batch",
+        json={
+            "operations": [
+                {"op": "create", "contact": {"name": "Bob", "telephone": "200"}},
+                {"op": "delete", "id": ann["id"]},
+            ]
+        },
+    )
+    assert applied.get_json()["applied"] is True
+    assert _names(client) == ["Bob"]
+    assert b'Name="Bob"' in client.get("/phonebook.xml").data
+
+
+def test_contact_summary_is_built_once_per_generation(make_app, monkeypatch):
+    client = make_app().test_client()
+    _create(client, "Ann", "Sales")
+    _create(client, "Bob", "Staff")
+    builds = []
+    build = routes.fetch_contact_summary
+    monkeypatch.setattr(
+        routes, "fetch_contact_summary", lambda *args: builds.append(args) or build(*args)
+    )
+
+    client.get("/")
+    client.get("/api/contacts")
+    client.get("/phonebook/sales.xml")
+    contacts = client.get("/status.json").get_json()["contacts"]
+
+    assert len(builds) == 1
+    assert contacts["total"] == 2 and contacts["groups"] == 2
+    assert contacts["summary_bytes"] > 0
+
+    _create(client, "Cid", "Support")
+    contacts = client.get("/status.json").get_json()["contacts"]
+
+    assert len(builds) == 2
+    assert contacts["total"] == 3 and contacts["groups"] == 3
+    assert client.get("/api/contacts").get_json()["total"] == 3
+    assert len(builds) == 2
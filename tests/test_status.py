@@ -0,0 +1,156 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler
+from types import SimpleNamespace
+
+from app import status
+
+
+class _ReleaseAPI(BaseHTTPRequestHandler):
+    # GitHub and Docker Hub in one: JSON with an ETag, 304 on a match
+    requests = []
+    failing = False
+    # Replaces both JSON bodies when set
+    body = None
+
+    def do_GET(self):
+        type(self).requests.append((self.path, self.headers.get("If-None-Match")))
+        if type(self).failing:
+            self.send_error(503)
+            return
+        if self.path.startswith("/repos/"):
+            etag, payload = '"gh-1"', {"tag_name": "v1.4.0"}
+        else:
+            etag, payload = '"hub-1"', {"results": [{"name": "1.3.0"}, {"name": "latest"}]}
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        body = type(self).body or json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _release_status_client(serve, make_app, monkeypatch, clock):
+    _ReleaseAPI.requests = []
+    _ReleaseAPI.failing = False
+    _ReleaseAPI.body = None
+    base_url = serve(_ReleaseAPI)
+    monkeypatch.setenv("GITHUB_API_URL", base_url)
+    monkeypatch.setenv("DOCKER_HUB_API_URL", base_url)
+    monkeypatch.setenv("STATUS_CACHE_TTL", "300")
+    monkeypatch.setenv("STATUS_RETRY_BACKOFF", "30")
+    monkeypatch.setattr(status, "time", SimpleNamespace(time=lambda: clock[0]))
+    # A refresh another test left in flight must not stand in for ours
+    monkeypatch.setattr(status, "_EXECUTOR", None)
+    monkeypatch.setattr(status, "_REFRESH", None)
+    app = make_app()
+
+    def release_status():
+        # Waits for the background refresh a call started, if any
+        with app.app_context():
+            result = status.get_release_status()
+        if status._REFRESH is not None:
+            status._REFRESH.result(timeout=5)
+        return result
+
+    return release_status
+
+
+def test_release_status_revalidates_and_backs_off(serve, make_app, monkeypatch):
+    clock = [1000.0]
+    release_status = _release_status_client(serve, make_app, monkeypatch, clock)
+
+    assert release_status()["github"]["status"] == "pending"
+    fetched = release_status()
+    assert fetched["github"] == {"status": "up_to_date", "version": "v1.4.0"}
+    assert fetched["docker"] == {"status": "up_to_date", "version": "1.3.0"}
+    assert [etag for _, etag in _ReleaseAPI.requests] == [None, None]
+
+    # Within the TTL nothing is fetched; after it, the ETags are sent back
+    clock[0] += 100
+    release_status()
+    assert len(_ReleaseAPI.requests) == 2
+    clock[0] += 300
+    release_status()
+    assert sorted(etag for _, etag in _ReleaseAPI.requests[2:]) == ['"gh-1"', '"hub-1"']
+    assert release_status() == fetched
+
+    # An outage keeps the last good answer and waits 30s, then 60s, to retry
+    _ReleaseAPI.failing = True
+    clock[0] += 300
+    release_status()
+    assert release_status() == fetched
+    assert len(_ReleaseAPI.requests) == 6
+    clock[0] += 20
+    release_status()
+    assert len(_ReleaseAPI.requests) == 6
+    clock[0] += 15
+    release_status()
+    assert len(_ReleaseAPI.requests) == 8
+    clock[0] += 45
+    release_status()
+    assert len(_ReleaseAPI.requests) == 8
+
+    _ReleaseAPI.failing = False
+    clock[0] += 20
+    release_status()
+    assert release_status() == fetched
+    assert len(_ReleaseAPI.requests) == 10
+
+
+def test_unexpected_release_payloads_are_settled_until_the_next_refresh(
+    serve, make_app, monkeypatch
+):
+    clock = [1000.0]
+    release_status = _release_status_client(serve, make_app, monkeypatch, clock)
+    _ReleaseAPI.body = b'["not", "an", "object"]'
+
+    release_status()
+
+    assert release_status() == {
+        "github": {"status": "unknown", "version": None},
+        "docker": {"status": "unknown", "version": None},
+    }
+    assert len(_ReleaseAPI.requests) == 2
+
+
+def test_workers_share_one_release_status_cache(serve, make_app, monkeypatch):
+    clock = [1000.0]
+    release_status = _release_status_client(serve, make_app, monkeypatch, clock)
+    release_status()
+    fetched = release_status()
+    assert len(_ReleaseAPI.requests) == 2
+
+    # Another worker starts with nothing in memory and reads the shared file
+    monkeypatch.setattr(status, "_STATE_MEMO", {"path": None, "key": None, "state": None})
+    other_worker = make_app()
+    with other_worker.app_context():
+        assert status.get_release_status() == fetched
+    assert len(_ReleaseAPI.requests) == 2
+
+    # Once due, workers refreshing at the same time queue on the file lock
+    # and only the first one goes to the network.
+    clock[0] += 400
+    with other_worker.app_context():
+        sources = status._status_sources()
+    executor = ThreadPoolExecutor(max_workers=4)
+    refreshes = [
+        threading.Thread(target=status._refresh, args=(executor, sources)) for _ in range(3)
+    ]
+    for refresh in refreshes:
+        refresh.start()
+    for refresh in refreshes:
+        refresh.join(5)
+    executor.shutdown()
+
+    assert len(_ReleaseAPI.requests) == 4
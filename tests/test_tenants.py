@@ -0,0 +1,34 @@
+import threading
+
+from app.tenants import TenantRegistry
+
+
+def test_opening_a_slow_tenant_does_not_block_the_others(tmp_path):
+    for name in ("slow", "fast"):
+        (tmp_path / name).mkdir()
+    release = threading.Event()
+    opened = []
+
+    def open_tenant(tenant):
+        opened.append(tenant.name)
+        if tenant.name == "slow":
+            assert release.wait(5)
+
+    registry = TenantRegistry(
+        tmp_path, {}, capacity=4, open_tenant=open_tenant, close_tenant=lambda tenant: None
+    )
+    results = {}
+    waiters = [
+        threading.Thread(target=lambda index=index: results.update({index: registry.get("slow")}))
+        for index in range(2)
+    ]
+    for waiter in waiters:
+        waiter.start()
+
+    assert registry.get("fast").name == "fast"
+    release.set()
+    for waiter in waiters:
+        waiter.join(5)
+
+    assert results[0] is results[1] and results[0].name == "slow"
+    assert sorted(opened) == ["fast", "slow"]
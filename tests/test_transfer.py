@@ -0,0 +1,42 @@
+import io
+
+from app.transfer import iter_vcard_export, iter_vcard_records
+
+
+def _contact(name, group_name):
+    return {
+        "name": name,
+        "group_name": group_name,
+        "telephone": "+4930123",
+        "mobile": "",
+        "other": "",
+    }
+
+
+def test_vcard_round_trip_keeps_special_characters():
+    contacts = [
+        _contact("Doe, Jane; PhD", "Sales, North; EU"),
+        _contact("Back\\slash \\n literal", "C:\\Group\\"),
+        _contact("Line\nBreak", "Two\nLines"),
+    ]
+    exported = "".join(iter_vcard_export(contacts)).encode("utf-8")
+
+    records = list(iter_vcard_records(io.BytesIO(exported)))
+
+    assert [(record["name"], record["group_name"]) for record in records] == [
+        (contact["name"], contact["group_name"]) for contact in contacts
+    ]
+
+
+def test_vcard_import_splits_categories_and_names_on_unescaped_separators_only():
+    card = (
+        "BEGIN:VCARD\r\n"
+        r"N:Smith\;Jones;Ann\, Jr.;;;" "\r\n"
+        r"CATEGORIES:R\,D,Staff" "\r\n"
+        "END:VCARD\r\n"
+    )
+
+    (record,) = iter_vcard_records(io.BytesIO(card.encode("utf-8")))
+
+    assert record["name"] == "Ann, Jr. Smith;Jones"
+    assert record["group_name"] == "R,D"